@@ -0,0 +1,223 @@
+# arrow_interchange.py
+import io
+import os
+import zipfile
+from datetime import datetime, timezone
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+import data as price_data
+from data import TAG_FIELDS
+
+# Supported formats and the file extension used for each table in a bundle
+FORMAT_EXTENSIONS = {"ipc": ".arrow", "parquet": ".parquet"}
+
+TOTALS_TABLE = "databricks_totals"
+S3_TABLE = "s3_storage"
+SQL_TABLE = "sql_warehouses"
+WAREHOUSE_FIELDS = ["id", "name", "type", "size", "hours_per_day", "days_per_month", "auto_suspend", "suspend_after"]
+
+
+def _tier_table_name(tier):
+    """'L0 / Bronze' -> 'databricks_L0_Bronze'."""
+    return "databricks_" + tier.replace(" / ", "_").replace(" ", "_")
+
+
+def _to_table(df, metadata):
+    """Converts a DataFrame to an Arrow table and attaches the estimate metadata to its schema."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    merged = dict(table.schema.metadata or {})
+    merged.update({key.encode(): str(value).encode() for key, value in metadata.items()})
+    return table.replace_schema_metadata(merged)
+
+
+def build_estimate_tables(calculated_dbx_data, s3_calc_method, s3_direct_config, s3_table_based_config,
+                          sql_warehouses_config, s3_costs_per_zone, sql_costs_per_warehouse):
+    """
+    Builds one Arrow table per category of the calculated estimate: one per Databricks tier,
+    the per-tier totals, S3 storage and SQL warehouses. Every schema carries the category,
+    pricing version and export timestamp; tier tables also carry their tier name.
+    """
+    base_metadata = {
+        # Read at call time: the price watcher replaces it when prices are reloaded
+        "pricing_version": price_data.PRICING_VERSION,
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+    }
+    tables = {}
+
+    totals = []
+    for tier, data in calculated_dbx_data.items():
+        name = _tier_table_name(tier)
+        tables[name] = _to_table(data['df'], {**base_metadata, "category": "databricks_jobs", "tier": tier})
+        totals.append({"Tier": tier, "DBU Cost": float(data['dbu_cost']), "EC2 Cost": float(data['ec2_cost'])})
+    tables[TOTALS_TABLE] = _to_table(
+        pd.DataFrame(totals, columns=["Tier", "DBU Cost", "EC2 Cost"]),
+        {**base_metadata, "category": "databricks_totals"}
+    )
+
+    if s3_calc_method == "Direct Storage":
+        s3_rows = [{
+            "Zone": zone,
+            "Storage Class": config["class"],
+            "Storage Amount": float(config["amount"]),
+            "Unit": config["unit"],
+            "Monthly Growth %": float(config.get("monthly_growth_percent", 0.0)),
+            "Monthly Cost ($)": float(s3_costs_per_zone.get(zone, 0.0)),
+        } for zone, config in s3_direct_config.items()]
+        s3_columns = ["Zone", "Storage Class", "Storage Amount", "Unit", "Monthly Growth %", "Monthly Cost ($)"]
+    else:
+        s3_rows = [{
+            "Zone": zone,
+            "Table Name": table_config.get("Table Name", ""),
+            "Records": float(table_config.get("Records", 0) or 0),
+            "Columns": float(table_config.get("Columns", 0) or 0),
+            **{tag: table_config.get(tag) or "" for tag in TAG_FIELDS},
+            "Zone Monthly Cost ($)": float(s3_costs_per_zone.get(zone, 0.0)),
+        } for zone, table_configs in s3_table_based_config.items() for table_config in table_configs if isinstance(table_config, dict)]
+        s3_columns = ["Zone", "Table Name", "Records", "Columns"] + TAG_FIELDS + ["Zone Monthly Cost ($)"]
+    tables[S3_TABLE] = _to_table(
+        pd.DataFrame(s3_rows, columns=s3_columns),
+        {**base_metadata, "category": "s3_storage", "s3_calc_method": s3_calc_method}
+    )
+
+    sql_rows = []
+    for warehouse, cost in zip(sql_warehouses_config, sql_costs_per_warehouse):
+        row = {field: warehouse.get(field) for field in WAREHOUSE_FIELDS}
+        row.update({tag: warehouse.get("tags", {}).get(tag, "") for tag in TAG_FIELDS})
+        row["Monthly Cost ($)"] = float(cost)
+        sql_rows.append(row)
+    tables[SQL_TABLE] = _to_table(
+        pd.DataFrame(sql_rows, columns=WAREHOUSE_FIELDS + TAG_FIELDS + ["Monthly Cost ($)"]),
+        {**base_metadata, "category": "sql_warehouses"}
+    )
+    return tables
+
+
+def _write_table(table, sink, fmt):
+    """Writes a single table to a path or file-like sink as Arrow IPC (file format) or Parquet."""
+    if fmt == "ipc":
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        pq.write_table(table, sink)
+
+
+def write_estimate_dataset(tables, directory, fmt="ipc"):
+    """Writes each table to its own file in directory, ready for downstream tools to memory-map."""
+    os.makedirs(directory, exist_ok=True)
+    for name, table in tables.items():
+        _write_table(table, os.path.join(directory, name + FORMAT_EXTENSIONS[fmt]), fmt)
+
+
+def generate_estimate_bundle(tables, fmt="ipc"):
+    """
+    Packs the tables into a single uncompressed zip for download. Members are stored, not
+    deflated, so once extracted the files are byte-identical to write_estimate_dataset output.
+    """
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED) as bundle:
+        for name, table in tables.items():
+            sink = pa.BufferOutputStream()
+            _write_table(table, sink, fmt)
+            bundle.writestr(name + FORMAT_EXTENSIONS[fmt], sink.getvalue().to_pybytes())
+    output.seek(0)
+    return output.getvalue()
+
+
+def _read_table(source, fmt):
+    """Reads one table; paths are memory-mapped so column buffers are not copied into the heap."""
+    if fmt == "ipc":
+        if isinstance(source, str):
+            source = pa.memory_map(source, "r")
+        return ipc.open_file(source).read_all()
+    if isinstance(source, str):
+        return pq.read_table(source, memory_map=True)
+    return pq.read_table(source)
+
+
+def read_estimate_tables(source):
+    """
+    Reads the tables written by write_estimate_dataset (a directory) or generate_estimate_bundle
+    (a zip path, bytes or file-like object). Returns {table name: pyarrow.Table}.
+    """
+    tables = {}
+    if isinstance(source, str) and os.path.isdir(source):
+        for file_name in sorted(os.listdir(source)):
+            stem, extension = os.path.splitext(file_name)
+            for fmt, fmt_extension in FORMAT_EXTENSIONS.items():
+                if extension == fmt_extension:
+                    tables[stem] = _read_table(os.path.join(source, file_name), fmt)
+        return tables
+
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    try:
+        with zipfile.ZipFile(source) as bundle:
+            for member in bundle.namelist():
+                stem, extension = os.path.splitext(member)
+                for fmt, fmt_extension in FORMAT_EXTENSIONS.items():
+                    if extension == fmt_extension:
+                        tables[stem] = _read_table(pa.BufferReader(bundle.read(member)), fmt)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Not an estimate bundle: {e}") from e
+    return tables
+
+
+def table_metadata(table):
+    """Returns the estimate metadata stored on a table's schema as a str -> str dict."""
+    return {key.decode(): value.decode() for key, value in (table.schema.metadata or {}).items() if key != b"pandas"}
+
+
+def tables_to_estimate(tables):
+    """
+    Rebuilds the calculator's structures from exported tables:
+    calculated_dbx_data, S3 method/configs/costs, SQL warehouse configs/costs and metadata.
+    """
+    if TOTALS_TABLE not in tables:
+        raise ValueError(f"Missing '{TOTALS_TABLE}' table; not an exported estimate.")
+
+    calculated_dbx_data = {}
+    for row in tables[TOTALS_TABLE].to_pylist():
+        tier = row["Tier"]
+        tier_table = tables.get(_tier_table_name(tier))
+        df = tier_table.to_pandas() if tier_table is not None else pd.DataFrame()
+        calculated_dbx_data[tier] = {"df": df, "dbu_cost": row["DBU Cost"], "ec2_cost": row["EC2 Cost"]}
+
+    s3_table = tables[S3_TABLE]
+    s3_calc_method = table_metadata(s3_table).get("s3_calc_method", "Direct Storage")
+    s3_direct, s3_table_based, s3_costs_per_zone = {}, {}, {}
+    for row in s3_table.to_pylist():
+        zone = row["Zone"]
+        if s3_calc_method == "Direct Storage":
+            s3_direct[zone] = {
+                "class": row["Storage Class"],
+                "amount": row["Storage Amount"],
+                "unit": row["Unit"],
+                "monthly_growth_percent": row["Monthly Growth %"],
+            }
+            s3_costs_per_zone[zone] = row["Monthly Cost ($)"]
+        else:
+            s3_table_based.setdefault(zone, []).append({
+                "Table Name": row["Table Name"], "Records": row["Records"], "Columns": row["Columns"],
+                **{tag: row.get(tag) or "" for tag in TAG_FIELDS}
+            })
+            s3_costs_per_zone[zone] = row["Zone Monthly Cost ($)"]
+
+    sql_rows = tables[SQL_TABLE].to_pylist()
+    sql_warehouses = [
+        {**{field: row[field] for field in WAREHOUSE_FIELDS}, "tags": {tag: row.get(tag) or "" for tag in TAG_FIELDS}}
+        for row in sql_rows
+    ]
+    sql_costs_per_warehouse = [row["Monthly Cost ($)"] for row in sql_rows]
+
+    return {
+        "calculated_dbx_data": calculated_dbx_data,
+        "s3_calc_method": s3_calc_method,
+        "s3_direct": s3_direct,
+        "s3_table_based": s3_table_based,
+        "s3_costs_per_zone": s3_costs_per_zone,
+        "sql_warehouses": sql_warehouses,
+        "sql_costs_per_warehouse": sql_costs_per_warehouse,
+        "metadata": table_metadata(tables[TOTALS_TABLE]),
+    }
@@ -1,8 +1,29 @@
 # calculations.py
 import streamlit as st
+import numpy as np
 import pandas as pd
 from data import DBU_RATES, FLAT_INSTANCE_LIST, S3_PRICING, SQL_WAREHOUSE_PRICING, PHOTON_PREMIUM_MULTIPLIER, SPOT_DISCOUNT_MULTIPLIER, DEFAULT_KB_PER_RECORD_PER_COLUMN
 
+def price_jobs(jobs_df, dbu_rate):
+    """
+    Returns a copy of jobs_df with 'DBU Units', 'DBU Cost' and 'EC2 Cost' columns.
+    dbu_rate may be a scalar or a per-row Series, so frames mixing several tiers
+    can be priced in a single vectorized pass.
+    """
+    df = jobs_df.copy()
+
+    # DBU units per job
+    df['DBU Units'] = df["Runtime (hrs)"] * df["Runs/Month"] * df["Nodes"]
+    photon_multiplier = np.where(df['Photon'].astype(bool), PHOTON_PREMIUM_MULTIPLIER, 1.0)
+    df['DBU Cost'] = df['DBU Units'] * dbu_rate * photon_multiplier
+
+    # EC2 cost per job
+    spot_multiplier = np.where(df['Spot'].astype(bool), SPOT_DISCOUNT_MULTIPLIER, 1.0)
+    ec2_rate = df["Instance Type"].map(FLAT_INSTANCE_LIST).fillna(0).astype(float) * spot_multiplier
+    df['EC2 Cost'] = df['DBU Units'] * ec2_rate
+
+    return df
+
 def calculate_databricks_costs_for_tier(jobs_df, tier):
     """
     Calculates costs for a specific tier's DataFrame.
@@ -11,25 +32,7 @@ def calculate_databricks_costs_for_tier(jobs_df, tier):
     if jobs_df.empty:
         return pd.DataFrame(columns=["#", "Job Name", "Runtime (hrs)", "Runs/Month", "Instance Type", "Nodes", "Photon", "Spot", "DBU Cost", "EC2 Cost", "Total Cost"]), 0, 0
 
-    df = jobs_df.copy()
-    base_dbu_rate = DBU_RATES[tier]
-
-    # Calculate DBU Rate per job
-    df['DBU Units'] = df.apply(
-        lambda row: row["Runtime (hrs)"] * row["Runs/Month"] * row["Nodes"],
-        axis=1
-    )
-    df['DBU Cost'] = df.apply(
-        lambda row: row['DBU Units'] * base_dbu_rate * (PHOTON_PREMIUM_MULTIPLIER if row['Photon'] else 1.0),
-        axis=1
-    )
-
-
-    # Calculate EC2 Cost per job
-    def get_ec2_cost(row):
-        ec2_rate = FLAT_INSTANCE_LIST.get(row["Instance Type"], 0) * (SPOT_DISCOUNT_MULTIPLIER if row["Spot"] else 1.0)
-        return row["Runtime (hrs)"] * row["Runs/Month"] * row["Nodes"] * ec2_rate
-    df['EC2 Cost'] = df.apply(get_ec2_cost, axis=1)
+    df = price_jobs(jobs_df, DBU_RATES[tier])
 
     # Calculate total costs for the tier
     total_dbu_cost = df['DBU Cost'].sum()
@@ -37,18 +40,67 @@ def calculate_databricks_costs_for_tier(jobs_df, tier):
 
     return df, total_dbu_cost, total_ec2_cost
 
-def calculate_s3_cost_per_zone():
+def calculate_databricks_costs_incremental(jobs_df, tier, cached=None, changed_prices=None, generation=0):
+    """
+    Prices a tier like calculate_databricks_costs_for_tier, reusing `cached` (the entry returned by
+    the previous call for this tier) where possible:
+      - same job table and no price changes: the cached result is returned as is;
+      - same job table and only instance prices changed: only the EC2 Cost of jobs on those instance
+        types is recomputed, found through the cached instance -> row positions index;
+      - anything else (edited jobs, a DBU rate change, unknown changes): the tier is priced in full.
+    changed_prices is the set of price keys changed since the cached entry's generation, or None.
+    Returns (df, dbu cost, ec2 cost, new cache entry, number of jobs repriced).
+    """
+    reusable = (
+        cached is not None and cached["jobs"] is jobs_df and changed_prices is not None
+        and ("dbu", tier) not in changed_prices
+    )
+    if not reusable:
+        df, dbu_cost, ec2_cost = calculate_databricks_costs_for_tier(jobs_df, tier)
+        index = jobs_df.groupby("Instance Type", sort=False).indices if not jobs_df.empty else {}
+        entry = {"jobs": jobs_df, "df": df, "dbu_cost": dbu_cost, "ec2_cost": ec2_cost, "index": index, "generation": generation}
+        return df, dbu_cost, ec2_cost, entry, len(jobs_df)
+
+    positions = [cached["index"][key[1]] for key in changed_prices if key[0] == "instance" and key[1] in cached["index"]]
+    if not positions:
+        return cached["df"], cached["dbu_cost"], cached["ec2_cost"], {**cached, "generation": generation}, 0
+
+    rows = np.concatenate(positions)
+    df = cached["df"].copy()
+    ec2_column = df.columns.get_loc('EC2 Cost')
+    df.iloc[rows, ec2_column] = price_jobs(jobs_df.iloc[rows], DBU_RATES[tier])['EC2 Cost'].to_numpy()
+    ec2_cost = df['EC2 Cost'].sum()
+    entry = {**cached, "df": df, "ec2_cost": ec2_cost, "generation": generation}
+    return df, cached["dbu_cost"], ec2_cost, entry, len(rows)
+
+def calculate_s3_table_cost(table_config):
+    """Monthly Standard-class storage cost of one table in the Table-Based S3 estimate."""
+    records = float(table_config.get("Records", 0) or 0)
+    num_columns = float(table_config.get("Columns", 0) or 0)
+    # DEFAULT_KB_PER_RECORD_PER_COLUMN is in KB, so divide by 1024 * 1024 for GB
+    estimated_gb = (records * num_columns * DEFAULT_KB_PER_RECORD_PER_COLUMN) / (1024 * 1024)
+    return estimated_gb * S3_PRICING["Standard"]["storage_gb"]
+
+def calculate_s3_cost_per_zone(s3_calc_method=None, s3_direct_config=None, s3_table_based_config=None):
     """
     Calculates S3 cost for each individual zone, the total current cost,
     and the total 12-month projected cost.
+    Configs default to the current session state; pass them explicitly to price a saved estimate.
     """
+    if s3_calc_method is None:
+        s3_calc_method = st.session_state.s3_calc_method
+    if s3_direct_config is None:
+        s3_direct_config = st.session_state.s3_direct
+    if s3_table_based_config is None:
+        s3_table_based_config = st.session_state.s3_table_based
+
     current_costs_per_zone = {}
     projected_costs_per_zone = {} # Keep this for S3 tab display if needed, or remove if not displayed individually
     total_s3_cost = 0
     total_projected_s3_cost_12_months = 0
 
-    if st.session_state.s3_calc_method == "Direct Storage":
-        for zone, config in st.session_state.s3_direct.items():
+    if s3_calc_method == "Direct Storage":
+        for zone, config in s3_direct_config.items():
             pricing = S3_PRICING.get(config["class"], {"storage_gb": 0, "put_1k": 0, "get_1k": 0})
             storage_gb = config["amount"] * 1024 if config["unit"] == "TB" else config["amount"]
             
@@ -76,21 +128,10 @@ def calculate_s3_cost_per_zone():
             total_projected_s3_cost_12_months += zone_projected_cost
             
     else: # Table-Based
-        standard_pricing = S3_PRICING["Standard"]
-        for zone, list_of_table_configs in st.session_state.s3_table_based.items():
-            zone_estimated_gb = 0
-            for table_config in list_of_table_configs:
-                if isinstance(table_config, dict):
-                    records = float(table_config.get("Records", 0))
-                    # Retrieve the number of columns
-                    num_columns = float(table_config.get("Columns", 0)) # <--- Changed here
-
-                    # Calculate estimated GB: (records * num_columns * DEFAULT_KB_PER_RECORD_PER_COLUMN) / (1024 * 1024)
-                    # Assuming DEFAULT_KB_PER_RECORD_PER_COLUMN is in KB
-                    estimated_gb_for_table = (records * num_columns * DEFAULT_KB_PER_RECORD_PER_COLUMN) / (1024 * 1024)
-                    zone_estimated_gb += estimated_gb_for_table
-
-            zone_current_cost = zone_estimated_gb * standard_pricing["storage_gb"]
+        for zone, list_of_table_configs in s3_table_based_config.items():
+            zone_current_cost = sum(
+                calculate_s3_table_cost(table_config) for table_config in list_of_table_configs if isinstance(table_config, dict)
+            )
             current_costs_per_zone[zone] = zone_current_cost
             total_s3_cost += zone_current_cost
             
@@ -100,14 +141,44 @@ def calculate_s3_cost_per_zone():
 
     return current_costs_per_zone, total_s3_cost, total_projected_s3_cost_12_months
 
-def calculate_sql_warehouse_cost():
-    """Calculates total SQL Warehouse cost from session state."""
-    total_sql_cost = 0
-    for warehouse in st.session_state.sql_warehouses:
+def calculate_sql_warehouse_cost_per_warehouse(sql_warehouses_config=None):
+    """Returns the monthly cost of each SQL Warehouse, in configuration order."""
+    if sql_warehouses_config is None:
+        sql_warehouses_config = st.session_state.sql_warehouses
+
+    costs = []
+    for warehouse in sql_warehouses_config:
+        cost = 0
         if warehouse["hours_per_day"] > 0 and warehouse["days_per_month"] > 0:
             size_key = warehouse["size"].split(" - ")[0]
             hourly_rate = SQL_WAREHOUSE_PRICING.get(size_key, {}).get("cost_per_hr", 0)
             cost = hourly_rate * warehouse["hours_per_day"] * warehouse["days_per_month"]
-            total_sql_cost += cost
+        costs.append(cost)
+    return costs
+
+def calculate_sql_warehouse_cost(sql_warehouses_config=None):
+    """Calculates total SQL Warehouse cost from session state."""
+    total_sql_cost = sum(calculate_sql_warehouse_cost_per_warehouse(sql_warehouses_config))
             
     return total_sql_cost
+
+def combine_calculated_jobs(calculated_dbx_data):
+    """
+    Stacks the calculated per-tier DataFrames into a single DataFrame with a 'Tier'
+    column and a per-job 'Total Cost' (DBU Cost + EC2 Cost).
+    """
+    frames = []
+    for tier, data in calculated_dbx_data.items():
+        df = data['df']
+        if df.empty:
+            continue
+        df = df.copy()
+        df['Tier'] = tier
+        frames.append(df)
+
+    if not frames:
+        return pd.DataFrame(columns=["Tier", "#", "Job Name", "Runtime (hrs)", "Runs/Month", "Instance Type", "Nodes", "Photon", "Spot", "DBU Units", "DBU Cost", "EC2 Cost", "Total Cost"])
+
+    combined = pd.concat(frames, ignore_index=True)
+    combined['Total Cost'] = combined['DBU Cost'] + combined['EC2 Cost']
+    return combined
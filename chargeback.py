@@ -0,0 +1,161 @@
+# chargeback.py
+import hashlib
+import numpy as np
+import pandas as pd
+from data import TAG_FIELDS
+from calculations import combine_calculated_jobs, calculate_s3_table_cost, calculate_sql_warehouse_cost_per_warehouse
+
+UNTAGGED = "(untagged)"
+MEASURES = ["DBU Cost", "EC2 Cost", "S3 Cost", "SQL Cost", "Total Cost"]
+ITEM_COLUMNS = ["Category", "Scope", "Item"] + TAG_FIELDS + MEASURES
+# Columns the index can group by: the cost category plus every tag
+GROUP_DIMENSIONS = ["Category"] + TAG_FIELDS
+
+# Above this many possible tag combinations the dense bincount key space is compacted first
+MAX_DENSE_GROUPS = 5_000_000
+
+
+def _clean_tags(values):
+    """Normalizes blank / missing tag values to UNTAGGED."""
+    cleaned = pd.Series(values, dtype=object).fillna("").astype(str).str.strip()
+    return cleaned.where(cleaned != "", UNTAGGED)
+
+
+def build_cost_items(calculated_dbx_data, s3_calc_method, s3_direct_config, s3_table_based_config,
+                     s3_zone_tags, s3_costs_per_zone, sql_warehouses_config):
+    """
+    Flattens the estimate into one row per chargeable item (job, S3 zone or table, SQL warehouse)
+    with its tags and its cost split into the MEASURES columns.
+    """
+    frames = []
+
+    jobs = combine_calculated_jobs(calculated_dbx_data)
+    if not jobs.empty:
+        job_items = pd.DataFrame({
+            "Category": "Databricks",
+            "Scope": jobs['Tier'],
+            "Item": jobs['Job Name'].astype(str),
+            "DBU Cost": jobs['DBU Cost'].astype(float),
+            "EC2 Cost": jobs['EC2 Cost'].astype(float),
+        })
+        for tag in TAG_FIELDS:
+            job_items[tag] = jobs[tag].to_numpy() if tag in jobs.columns else ""
+        frames.append(job_items)
+
+    s3_rows = []
+    if s3_calc_method == "Direct Storage":
+        for zone, cost in s3_costs_per_zone.items():
+            s3_rows.append({"Category": "S3 Storage", "Scope": zone, "Item": zone, "S3 Cost": cost, **s3_zone_tags.get(zone, {})})
+    else:
+        # Price each table on its own so tables can carry different tags than their zone; the
+        # tables of a zone add up to its s3_costs_per_zone entry
+        for zone, table_configs in s3_table_based_config.items():
+            zone_tags = s3_zone_tags.get(zone, {})
+            for table_config in table_configs:
+                if not isinstance(table_config, dict):
+                    continue
+                cost = calculate_s3_table_cost(table_config)
+                tags = {tag: table_config.get(tag) or zone_tags.get(tag, "") for tag in TAG_FIELDS}
+                s3_rows.append({"Category": "S3 Storage", "Scope": zone, "Item": table_config.get("Table Name", ""), "S3 Cost": cost, **tags})
+    if s3_rows:
+        frames.append(pd.DataFrame(s3_rows))
+
+    if sql_warehouses_config:
+        frames.append(pd.DataFrame([{
+            "Category": "SQL Warehouse",
+            "Scope": warehouse.get("type", ""),
+            "Item": warehouse["name"],
+            "SQL Cost": cost,
+            **warehouse.get("tags", {}),
+        } for warehouse, cost in zip(sql_warehouses_config, calculate_sql_warehouse_cost_per_warehouse(sql_warehouses_config))]))
+
+    if not frames:
+        return pd.DataFrame(columns=ITEM_COLUMNS)
+
+    items = pd.concat(frames, ignore_index=True).reindex(columns=ITEM_COLUMNS)
+    items[MEASURES[:-1]] = items[MEASURES[:-1]].fillna(0.0).astype(float)
+    items["Total Cost"] = items[MEASURES[:-1]].sum(axis=1)
+    for tag in TAG_FIELDS:
+        items[tag] = _clean_tags(items[tag]).to_numpy()
+    return items
+
+
+def fingerprint_items(items):
+    """Stable hash of the cost items, used to decide whether a cached index is still valid."""
+    if items.empty:
+        return "empty"
+    return hashlib.sha1(pd.util.hash_pandas_object(items, index=False).values.tobytes()).hexdigest()
+
+
+class ChargebackIndex:
+    """
+    Precomputed group indexes over the cost items. Each dimension is factorized once into integer
+    codes; grouping by any combination of dimensions is then a mixed-radix key plus one bincount
+    per measure, so re-slicing never re-hashes strings or rebuilds the cost items.
+    """
+
+    def __init__(self, items, fingerprint=None):
+        self.items = items
+        self.fingerprint = fingerprint or fingerprint_items(items)
+        self.codes = {}
+        self.uniques = {}
+        for dimension in GROUP_DIMENSIONS:
+            codes, uniques = pd.factorize(items[dimension], sort=True)
+            self.codes[dimension] = codes.astype(np.int64)
+            self.uniques[dimension] = np.asarray(uniques, dtype=object)
+        self.values = items[MEASURES].to_numpy(dtype=float)
+        self._cache = {}
+
+    def aggregate(self, dimensions):
+        """Returns costs grouped by the given dimensions (in order), largest Total Cost first."""
+        dimensions = tuple(dimensions)
+        if dimensions in self._cache:
+            return self._cache[dimensions]
+
+        if not dimensions:
+            result = pd.DataFrame([self.values.sum(axis=0)], columns=MEASURES)
+            result["Items"] = len(self.items)
+            self._cache[dimensions] = result
+            return result
+
+        shape = tuple(max(len(self.uniques[dimension]), 1) for dimension in dimensions)
+        key = np.ravel_multi_index([self.codes[dimension] for dimension in dimensions], shape)
+        num_groups = int(np.prod(shape))
+
+        if num_groups > MAX_DENSE_GROUPS:
+            # Too many combinations for a dense bincount; compact the keys that actually occur
+            group_keys, key = np.unique(key, return_inverse=True)
+            num_groups = len(group_keys)
+        else:
+            group_keys = None
+
+        counts = np.bincount(key, minlength=num_groups)
+        sums = np.column_stack([np.bincount(key, weights=self.values[:, i], minlength=num_groups) for i in range(len(MEASURES))])
+        present = np.flatnonzero(counts)
+        flat_keys = present if group_keys is None else group_keys[present]
+        dimension_codes = np.unravel_index(flat_keys, shape)
+
+        result = pd.DataFrame({
+            dimension: self.uniques[dimension][codes] if len(self.uniques[dimension]) else np.array([], dtype=object)
+            for dimension, codes in zip(dimensions, dimension_codes)
+        })
+        for i, measure in enumerate(MEASURES):
+            result[measure] = sums[present, i]
+        result["Items"] = counts[present]
+        result = result.sort_values("Total Cost", ascending=False, kind="stable").reset_index(drop=True)
+
+        self._cache[dimensions] = result
+        return result
+
+
+def get_chargeback_index(items, cache):
+    """
+    Returns a ChargebackIndex for items, reusing the one held in cache (a dict, e.g. session state)
+    when the items have not changed since it was built.
+    """
+    fingerprint = fingerprint_items(items)
+    cached = cache.get("chargeback_index")
+    if cached is None or cached.fingerprint != fingerprint:
+        cached = ChargebackIndex(items, fingerprint)
+        cache["chargeback_index"] = cached
+    return cached
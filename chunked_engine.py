@@ -0,0 +1,175 @@
+# chunked_engine.py
+# Out-of-core Databricks pricing for job inventories that do not fit in memory.
+#
+# Usage:
+#   python chunked_engine.py inventory.parquet --output-dir priced/ --workers 8
+#   python chunked_engine.py inventory.csv --chunk-rows 500000
+#
+# The inventory needs the job table columns plus a 'Tier' column naming one of DBU_RATES.
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import pandas as pd
+from data import DBU_RATES
+from calculations import price_jobs
+
+INVENTORY_COLUMNS = ["Tier", "Job Name", "Runtime (hrs)", "Runs/Month", "Instance Type", "Nodes", "Photon", "Spot"]
+DEFAULT_CHUNK_ROWS = 250_000
+TRUE_STRINGS = {"true", "1", "yes", "y", "t"}
+
+
+def _as_bool(series):
+    """CSV readers leave mixed/blank boolean columns as strings; 'False' must not become True."""
+    if series.dtype == bool:
+        return series
+    return series.astype(str).str.strip().str.lower().isin(TRUE_STRINGS)
+
+
+def price_chunk(chunk):
+    """
+    Prices one chunk of a mixed-tier inventory with the same formula as
+    calculate_databricks_costs_for_tier. Returns the priced chunk and its per-tier totals.
+    """
+    chunk = chunk.copy()
+    chunk['Photon'] = _as_bool(chunk['Photon'])
+    chunk['Spot'] = _as_bool(chunk['Spot'])
+
+    dbu_rate = chunk['Tier'].map(DBU_RATES)
+    unknown_tiers = chunk.loc[dbu_rate.isna(), 'Tier'].unique()
+    if len(unknown_tiers) > 0:
+        raise ValueError(f"Unknown tier(s) in inventory: {', '.join(map(str, unknown_tiers))}")
+
+    priced = price_jobs(chunk, dbu_rate)
+    totals = priced.groupby('Tier').agg(**{
+        "jobs": ('Job Name', 'size'),
+        "dbu_units": ('DBU Units', 'sum'),
+        "dbu_cost": ('DBU Cost', 'sum'),
+        "ec2_cost": ('EC2 Cost', 'sum'),
+    })
+    return priced, totals
+
+
+def _write_part(priced, output_dir, chunk_index):
+    """Writes one priced chunk as its own Parquet part file, named so parts sort in input order."""
+    priced.to_parquet(os.path.join(output_dir, f"part-{chunk_index:06d}.parquet"), index=False)
+
+
+def _price_csv_chunk(chunk, chunk_index, output_dir):
+    """Worker: prices a CSV chunk already read by the parent process."""
+    priced, totals = price_chunk(chunk)
+    if output_dir:
+        _write_part(priced, output_dir, chunk_index)
+    return totals
+
+
+def _price_parquet_row_group(path, row_group, chunk_index, output_dir):
+    """Worker: reads and prices a single Parquet row group, so only that row group is ever in memory."""
+    import pyarrow.parquet as pq
+
+    chunk = pq.ParquetFile(path).read_row_group(row_group, columns=INVENTORY_COLUMNS).to_pandas()
+    priced, totals = price_chunk(chunk)
+    if output_dir:
+        _write_part(priced, output_dir, chunk_index)
+    return totals
+
+
+def _parquet_tasks(source, chunk_rows, output_dir):
+    """
+    Plans the Parquet chunks. Row groups of at most chunk_rows are read by the workers themselves;
+    larger ones (writers often use a single huge group) are streamed here in chunk_rows batches and
+    handed out like CSV chunks, so they are still bounded by chunk_rows and spread over the pool.
+    """
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(source)
+    chunk_index = 0
+    for row_group in range(parquet_file.num_row_groups):
+        if parquet_file.metadata.row_group(row_group).num_rows <= chunk_rows:
+            yield _price_parquet_row_group, (source, row_group, chunk_index, output_dir)
+            chunk_index += 1
+            continue
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, row_groups=[row_group], columns=INVENTORY_COLUMNS):
+            yield _price_csv_chunk, (batch.to_pandas(), chunk_index, output_dir)
+            chunk_index += 1
+
+
+def _fold_totals(running, totals):
+    """Adds one chunk's per-tier totals into the running per-tier totals."""
+    return totals if running is None else running.add(totals, fill_value=0)
+
+
+def calculate_databricks_costs_chunked(source, output_dir=None, chunk_rows=DEFAULT_CHUNK_ROWS, max_workers=None):
+    """
+    Prices a Parquet or CSV job inventory chunk by chunk across a process pool and folds
+    per-tier totals as chunks complete. Parquet is split on row groups (read inside the
+    workers), with row groups larger than chunk_rows split further; CSV is read in chunk_rows
+    pieces. At most two chunks per worker are in flight, so peak memory is bounded by the
+    chunk size rather than the inventory size.
+
+    Priced rows are streamed to Parquet part files in output_dir when it is given; part files
+    from a previous run in that directory are removed first.
+    Returns {tier: {"jobs", "dbu_units", "dbu_cost", "ec2_cost"}} for every tier in DBU_RATES.
+    """
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        # Parts left by an earlier run would otherwise be read back alongside the new ones
+        for stale_part in glob.glob(os.path.join(output_dir, "part-*.parquet")):
+            os.remove(stale_part)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = max_workers * 2
+    running = None
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        if source.endswith(".parquet"):
+            tasks = _parquet_tasks(source, chunk_rows, output_dir)
+        else:
+            reader = pd.read_csv(source, usecols=INVENTORY_COLUMNS, chunksize=chunk_rows)
+            tasks = ((_price_csv_chunk, (chunk, i, output_dir)) for i, chunk in enumerate(reader))
+
+        pending = set()
+        for func, args in tasks:
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running = _fold_totals(running, future.result())
+            pending.add(pool.submit(func, *args))
+
+        for future in wait(pending).done:
+            running = _fold_totals(running, future.result())
+
+    tier_totals = {}
+    for tier in DBU_RATES.keys():
+        if running is not None and tier in running.index:
+            row = running.loc[tier]
+            tier_totals[tier] = {
+                "jobs": int(row["jobs"]),
+                "dbu_units": float(row["dbu_units"]),
+                "dbu_cost": float(row["dbu_cost"]),
+                "ec2_cost": float(row["ec2_cost"]),
+            }
+        else:
+            tier_totals[tier] = {"jobs": 0, "dbu_units": 0.0, "dbu_cost": 0.0, "ec2_cost": 0.0}
+    return tier_totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Price a large Databricks job inventory chunk by chunk.")
+    parser.add_argument("source", help="Parquet or CSV inventory with a 'Tier' column plus the job table columns")
+    parser.add_argument("--output-dir", help="Directory for priced Parquet part files, replacing any from an earlier run (omit to only report totals)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows per chunk (Parquet row groups up to this size are priced whole)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (defaults to CPU count)")
+    args = parser.parse_args()
+
+    tier_totals = calculate_databricks_costs_chunked(args.source, args.output_dir, args.chunk_rows, args.workers)
+    grand_total = 0
+    for tier, totals in tier_totals.items():
+        tier_total = totals["dbu_cost"] + totals["ec2_cost"]
+        grand_total += tier_total
+        print(f"{tier}: {totals['jobs']:,} jobs, DBU ${totals['dbu_cost']:,.2f}, EC2 ${totals['ec2_cost']:,.2f}, Total ${tier_total:,.2f}")
+    print(f"Monthly Total: ${grand_total:,.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# commitments.py
+import numpy as np
+import pandas as pd
+from data import DBU_COMMIT_DISCOUNTS, EC2_SAVINGS_PLAN_DISCOUNTS
+from calculations import combine_calculated_jobs
+from cost_breakdown import add_instance_family
+
+DEFAULT_COMMIT_LEVELS = 2000
+
+CURVE_COLUMNS = ["Term (months)", "Monthly Commit ($)", "Discount", "Effective Cost ($)", "On-Demand Cost ($)", "Savings ($)", "Savings %"]
+
+
+def dbu_usage_by_tier(calculated_dbx_data, sql_cost):
+    """Monthly DBU spend at list price per tier; SQL warehouses consume DBUs too, so they count towards the commit."""
+    rows = [{"Usage": tier, "Monthly Cost ($)": float(data['dbu_cost'])} for tier, data in calculated_dbx_data.items()]
+    rows.append({"Usage": "SQL Warehouse", "Monthly Cost ($)": float(sql_cost)})
+    return pd.DataFrame(rows)
+
+
+def on_demand_ec2_by_family(calculated_dbx_data):
+    """Monthly on-demand EC2 spend per instance family. Spot jobs are excluded: savings plans do not apply to them."""
+    jobs = combine_calculated_jobs(calculated_dbx_data)
+    jobs = add_instance_family(jobs[~jobs['Spot'].astype(bool)])
+    grouped = jobs.groupby('Instance Family', as_index=False)['EC2 Cost'].sum()
+    return grouped.rename(columns={'Instance Family': 'Usage', 'EC2 Cost': 'Monthly Cost ($)'})
+
+
+def project_monthly_usage(monthly_cost, growth_percent, months):
+    """List-price usage for each month of the horizon under compound monthly growth."""
+    return monthly_cost * (1 + growth_percent / 100) ** np.arange(months)
+
+
+def discount_for_levels(levels, breakpoints):
+    """Vectorized lookup of the discount that applies at each monthly commit level."""
+    thresholds = np.array([threshold for threshold, _ in breakpoints], dtype=float)
+    discounts = np.array([discount for _, discount in breakpoints], dtype=float)
+    index = np.searchsorted(thresholds, levels, side="right") - 1
+    return discounts[np.clip(index, 0, len(discounts) - 1)]
+
+
+def sweep_commitment(monthly_cost, growth_percent, discount_schedule, num_levels=DEFAULT_COMMIT_LEVELS):
+    """
+    Evaluates every (term, commit level) pair of the grid in one broadcast per term.
+
+    A monthly commit C bought at discount d covers C / (1 - d) of list-price usage; usage beyond
+    that is billed on demand, unused commitment is lost. Levels run from zero to the peak projected
+    monthly usage, beyond which committing more can only waste money.
+
+    Returns (curve DataFrame, optimum row as a dict, {term: break-even commit}).
+    """
+    frames = []
+    break_even = {}
+    peak_usage = monthly_cost * max(1.0, (1 + growth_percent / 100) ** (max(discount_schedule) - 1))
+    levels = np.linspace(0.0, peak_usage, num_levels)
+
+    for term, breakpoints in sorted(discount_schedule.items()):
+        usage = project_monthly_usage(monthly_cost, growth_percent, term)
+        discounts = discount_for_levels(levels, breakpoints)
+        covered = levels / (1 - discounts)
+
+        overage = np.maximum(usage[None, :] - covered[:, None], 0.0).sum(axis=1)
+        effective = levels * term + overage
+        on_demand = usage.sum()
+        savings = on_demand - effective
+
+        frames.append(pd.DataFrame({
+            "Term (months)": term,
+            "Monthly Commit ($)": levels,
+            "Discount": discounts,
+            "Effective Cost ($)": effective,
+            "On-Demand Cost ($)": on_demand,
+            "Savings ($)": savings,
+            "Savings %": savings / on_demand * 100 if on_demand > 0 else 0.0,
+        }))
+        # Largest commit that still does not lose money against on-demand
+        non_negative = np.flatnonzero(savings >= 0)
+        break_even[term] = float(levels[non_negative[-1]]) if non_negative.size else 0.0
+
+    curve = pd.concat(frames, ignore_index=True)[CURVE_COLUMNS]
+    # Terms differ in length, so compare them on average monthly savings
+    monthly_savings = curve["Savings ($)"] / curve["Term (months)"]
+    optimum = curve.loc[monthly_savings.idxmax()].to_dict()
+    optimum["Monthly Savings ($)"] = float(monthly_savings.max())
+    return curve, optimum, break_even
+
+
+def evaluate_commitments(calculated_dbx_data, sql_cost, growth_percent=0.0, num_levels=DEFAULT_COMMIT_LEVELS):
+    """
+    Sweeps DBU pre-purchase commits and EC2 savings plans for the estimate.
+    Returns {"dbu": ..., "ec2": ...}, each with the usage split, sweep curve, optimum and break-even levels.
+    """
+    results = {}
+    for key, usage, schedule in (
+        ("dbu", dbu_usage_by_tier(calculated_dbx_data, sql_cost), DBU_COMMIT_DISCOUNTS),
+        ("ec2", on_demand_ec2_by_family(calculated_dbx_data), EC2_SAVINGS_PLAN_DISCOUNTS),
+    ):
+        monthly_cost = float(usage["Monthly Cost ($)"].sum())
+        curve, optimum, break_even = sweep_commitment(monthly_cost, growth_percent, schedule, num_levels)
+        results[key] = {
+            "usage": usage,
+            "monthly_cost": monthly_cost,
+            "curve": curve,
+            "optimum": optimum,
+            "break_even": break_even,
+        }
+    return results
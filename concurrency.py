@@ -0,0 +1,246 @@
+# concurrency.py
+import calendar
+import hashlib
+import numpy as np
+import pandas as pd
+import streamlit as st
+from cost_breakdown import add_instance_family
+
+MINUTES_PER_DAY = 24 * 60
+PEAK_PERCENTILE = 95
+
+CRON_MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+# (low, high) bounds for minute, hour, day of month, month, day of week (0 and 7 are both Sunday)
+CRON_FIELD_BOUNDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+NUMERIC_SCHEDULE_COLUMNS = ["Runtime (hrs)", "Runs/Month", "Nodes"]
+SCHEDULE_COLUMNS = ["Tier", "Job Name", "Schedule", "Runtime (hrs)", "Runs/Month", "Instance Type", "Nodes"]
+
+
+def _parse_cron_field(text, low, high):
+    """Parses one cron field ('*', '*/15', '1-5', '0,30', '10-50/10') into a sorted array of values."""
+    values = set()
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step <= 0:
+                raise ValueError(f"Invalid step in cron field '{text}'")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"Cron field '{text}' is outside {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return np.array(sorted(values), dtype=np.int64)
+
+
+def parse_cron(expression):
+    """
+    Parses a five-field cron expression (minute hour day-of-month month day-of-week) or an
+    @macro. Raises ValueError for anything it cannot parse.
+    """
+    expression = CRON_MACROS.get(expression.strip().lower(), expression.strip())
+    fields = expression.split()
+    if len(fields) != 5:
+        raise ValueError(f"Expected 5 cron fields, got {len(fields)}: '{expression}'")
+    try:
+        minutes, hours, days, months, weekdays = (
+            _parse_cron_field(field, low, high) for field, (low, high) in zip(fields, CRON_FIELD_BOUNDS)
+        )
+    except ValueError as e:
+        raise ValueError(f"Invalid cron expression '{expression}': {e}") from e
+    return {
+        "minutes": minutes,
+        "hours": hours,
+        "days": days,
+        "months": months,
+        "weekdays": np.unique(weekdays % 7),
+        # Standard cron: when both day fields are restricted, a day matching either one runs
+        "day_or": not fields[2].startswith("*") and not fields[4].startswith("*"),
+    }
+
+
+def expand_cron(expression, year, month):
+    """Returns the start minute (from the first of the month) of every run in the given month."""
+    cron = parse_cron(expression)
+    if month not in cron["months"]:
+        return np.zeros(0, dtype=np.int64)
+
+    first_weekday, num_days = calendar.monthrange(year, month)
+    day_numbers = np.arange(1, num_days + 1)
+    # calendar counts Monday as 0, cron counts Sunday as 0
+    cron_weekdays = (first_weekday + day_numbers) % 7
+    dom_match = np.isin(day_numbers, cron["days"])
+    dow_match = np.isin(cron_weekdays, cron["weekdays"])
+    day_mask = (dom_match | dow_match) if cron["day_or"] else (dom_match & dow_match)
+
+    day_offsets = (day_numbers[day_mask] - 1) * MINUTES_PER_DAY
+    starts = day_offsets[:, None, None] + cron["hours"][None, :, None] * 60 + cron["minutes"][None, None, :]
+    return starts.ravel()
+
+
+def coerce_schedule_numbers(jobs):
+    """
+    Returns jobs with Runtime, Runs/Month and Nodes as floats, blank or invalid cells as 0.
+    The calculator tolerates blanks (the costs come out NaN), so the simulations must as well.
+    """
+    jobs = jobs.copy()
+    for column in NUMERIC_SCHEDULE_COLUMNS:
+        jobs[column] = pd.to_numeric(jobs[column], errors="coerce").fillna(0).astype(float)
+    return jobs
+
+
+def _even_starts(runs_per_month, month_minutes):
+    """Spreads an unscheduled job's runs evenly over the month, starting at midnight on the 1st."""
+    runs = int(round(runs_per_month))
+    if runs <= 0:
+        return np.zeros(0, dtype=np.int64)
+    return (np.arange(runs) * month_minutes) // runs
+
+
+def expand_job_runs(jobs, year, month):
+    """
+    Expands every job's runs for the month. Jobs with a cron 'Schedule' use it; the others spread
+    their Runs/Month evenly. Runs are clipped at the end of the month and empty runs dropped.
+
+    Returns {"job", "start", "end"} (one entry per run, in minutes from the first of the month),
+    plus "runs_per_job", "schedules" and "schedule_errors".
+    """
+    month_minutes = calendar.monthrange(year, month)[1] * MINUTES_PER_DAY
+    jobs = coerce_schedule_numbers(jobs)
+    schedules = jobs["Schedule"].fillna("").astype(str).str.strip() if "Schedule" in jobs.columns else pd.Series("", index=jobs.index)
+
+    # Expand each distinct schedule once; many jobs usually share the same cron expression
+    expanded = {}
+    schedule_errors = []
+    starts_per_job = []
+    for schedule, runs_per_month in zip(schedules, jobs["Runs/Month"]):
+        if schedule:
+            if schedule not in expanded:
+                try:
+                    expanded[schedule] = expand_cron(schedule, year, month)
+                except ValueError as e:
+                    schedule_errors.append(str(e))
+                    expanded[schedule] = None
+            starts = expanded[schedule]
+            if starts is None:
+                starts = _even_starts(runs_per_month, month_minutes)
+        else:
+            starts = _even_starts(runs_per_month, month_minutes)
+        starts_per_job.append(starts)
+
+    runs_per_job = np.array([len(starts) for starts in starts_per_job], dtype=np.int64)
+    run_job = np.repeat(np.arange(len(jobs)), runs_per_job)
+    run_start = np.concatenate(starts_per_job) if starts_per_job else np.zeros(0, dtype=np.int64)
+
+    durations = np.ceil(jobs["Runtime (hrs)"].astype(float).to_numpy() * 60).astype(np.int64)
+    run_end = np.minimum(run_start + durations[run_job], month_minutes)
+    active = run_end > run_start
+
+    return {
+        "job": run_job[active],
+        "start": run_start[active],
+        "end": run_end[active],
+        "runs_per_job": runs_per_job,
+        "schedules": schedules,
+        "schedule_errors": schedule_errors,
+    }
+
+
+def simulate_concurrency(jobs_df, year, month):
+    """
+    Computes per-minute concurrent node usage per (Tier, Instance Family) for the month's runs
+    (see expand_job_runs) with a bincount event sweep: +Nodes at each run start, -Nodes at each
+    end, then a cumulative sum along the minute axis.
+
+    Returns {"summary", "hourly_peak", "scheduled_runs", "schedule_errors"}.
+    """
+    month_minutes = calendar.monthrange(year, month)[1] * MINUTES_PER_DAY
+    jobs = add_instance_family(coerce_schedule_numbers(jobs_df.reset_index(drop=True)))
+    runs = expand_job_runs(jobs, year, month)
+    run_job, run_start, run_end = runs["job"], runs["start"], runs["end"]
+    nodes = jobs["Nodes"].astype(float).to_numpy()
+
+    group_codes, groups = pd.MultiIndex.from_frame(jobs[["Tier", "Instance Family"]]).factorize()
+    num_groups = max(len(groups), 1)
+    run_group = group_codes[run_job]
+    weights = nodes[run_job]
+
+    # Event sweep: one bincount for starts, one for ends, then cumsum per group
+    stride = month_minutes + 1
+    deltas = (
+        np.bincount(run_group * stride + run_start, weights=weights, minlength=num_groups * stride)
+        - np.bincount(run_group * stride + run_end, weights=weights, minlength=num_groups * stride)
+    )
+    usage = np.cumsum(deltas.reshape(num_groups, stride), axis=1)[:, :month_minutes]
+
+    rows = []
+    for i, (tier, family) in enumerate(groups):
+        rows.append(_usage_stats(usage[i], {"Tier": tier, "Instance Family": family}))
+    family_names = sorted({family for _, family in groups})
+    for family in family_names:
+        members = [i for i, (_, group_family) in enumerate(groups) if group_family == family]
+        rows.append(_usage_stats(usage[members].sum(axis=0), {"Tier": "All tiers", "Instance Family": family}))
+    rows.append(_usage_stats(usage.sum(axis=0), {"Tier": "All tiers", "Instance Family": "All families"}))
+    summary = pd.DataFrame(rows)
+
+    # Hourly maxima keep the chart payload at ~744 points per series
+    hours = month_minutes // 60
+    hourly_index = pd.date_range(pd.Timestamp(year=year, month=month, day=1), periods=hours, freq="h")
+    hourly_peak = pd.DataFrame(
+        {f"{tier} · {family}": usage[i].reshape(hours, 60).max(axis=1) for i, (tier, family) in enumerate(groups)},
+        index=hourly_index
+    )
+    hourly_peak["All"] = usage.sum(axis=0).reshape(hours, 60).max(axis=1)
+
+    scheduled_runs = jobs[["Tier", "Job Name", "Runs/Month"]].copy()
+    scheduled_runs["Schedule"] = runs["schedules"].to_numpy()
+    scheduled_runs["Simulated Runs"] = runs["runs_per_job"]
+
+    return {
+        "summary": summary,
+        "hourly_peak": hourly_peak,
+        "scheduled_runs": scheduled_runs,
+        "schedule_errors": runs["schedule_errors"],
+    }
+
+
+def _usage_stats(series, labels):
+    """Peak, P95 and mean concurrent nodes for one per-minute usage series."""
+    peak_minute = int(np.argmax(series)) if series.size else 0
+    return {
+        **labels,
+        "Peak Nodes": float(series.max()) if series.size else 0.0,
+        f"P{PEAK_PERCENTILE} Nodes": float(np.percentile(series, PEAK_PERCENTILE)) if series.size else 0.0,
+        "Mean Nodes": float(series.mean()) if series.size else 0.0,
+        "Peak At": f"Day {peak_minute // MINUTES_PER_DAY + 1}, {peak_minute % MINUTES_PER_DAY // 60:02d}:{peak_minute % 60:02d}",
+    }
+
+
+def fingerprint_schedule_inputs(jobs_df):
+    """Hash of the columns the simulation depends on, used as the cache key."""
+    if jobs_df.empty:
+        return "empty"
+    columns = [column for column in SCHEDULE_COLUMNS if column in jobs_df.columns]
+    return hashlib.sha1(pd.util.hash_pandas_object(jobs_df[columns], index=False).values.tobytes()).hexdigest()
+
+
+@st.cache_data(max_entries=8, show_spinner="Simulating job schedules...")
+def simulate_concurrency_cached(fingerprint, _jobs_df, year, month):
+    """simulate_concurrency, cached on the input fingerprint and month."""
+    return simulate_concurrency(_jobs_df, year, month)
@@ -0,0 +1,271 @@
+# consolidation.py
+import hashlib
+import numpy as np
+import pandas as pd
+import streamlit as st
+from concurrency import coerce_schedule_numbers, expand_job_runs
+
+DRIVER_NODES = 1
+# Capacity is checked on 5-minute slots; a run occupies every slot it touches, so fits are conservative
+SLOT_MINUTES = 5
+DEFAULT_MAX_CLUSTER_WORKERS = 32
+DEFAULT_STARTUP_MINUTES = 0
+DEFAULT_IDLE_MINUTES = 0
+# Jobs can only share a cluster when they agree on all of these
+COMPATIBILITY_COLUMNS = ["Tier", "Instance Type", "Photon", "Spot"]
+OWN_CLUSTER = "Own cluster"
+# Bins are tested for a fit this many at a time, so first-fit stops scanning early
+BIN_CHUNK = 64
+
+PLAN_COLUMNS = ["Tier", "Job Name", "Schedule", "Runtime (hrs)", "Runs/Month", "Instance Type", "Nodes", "Photon", "Spot", "DBU Units", "DBU Cost", "EC2 Cost"]
+
+
+def _slot_demand(starts, ends, workers):
+    """Slots a job's runs occupy and its worker demand in each; a job's own runs may overlap."""
+    slot_start = starts // SLOT_MINUTES
+    slot_end = -(-ends // SLOT_MINUTES)
+    lengths = slot_end - slot_start
+    offsets = np.repeat(slot_start - (np.cumsum(lengths) - lengths), lengths)
+    slots, counts = np.unique(offsets + np.arange(lengths.sum()), return_counts=True)
+    return slots, counts * workers
+
+
+def first_fit_decreasing(job_slots, job_demand, sizes, max_workers, num_slots):
+    """
+    Packs jobs onto clusters with first-fit-decreasing over slot timelines: jobs are taken largest
+    first and placed on the first cluster whose worker usage, plus the job's demand, stays within
+    its capacity in every slot the job runs in. A job larger than max_workers gets a cluster sized
+    for it alone.
+
+    Returns (cluster index per job, per-cluster slot usage, per-cluster capacity).
+    """
+    usage = np.zeros((16, num_slots))
+    capacity = np.zeros(16)
+    num_bins = 0
+    assignment = np.empty(len(sizes), dtype=np.int64)
+
+    for job in np.argsort(-np.asarray(sizes), kind="stable"):
+        slots, demand = job_slots[job], job_demand[job]
+        chosen = -1
+        for first in range(0, num_bins, BIN_CHUNK):
+            last = min(first + BIN_CHUNK, num_bins)
+            fits = np.flatnonzero((usage[first:last][:, slots] + demand <= capacity[first:last, None]).all(axis=1))
+            if fits.size:
+                chosen = first + fits[0]
+                break
+        if chosen < 0:
+            if num_bins == len(capacity):
+                usage = np.vstack([usage, np.zeros_like(usage)])
+                capacity = np.concatenate([capacity, np.zeros_like(capacity)])
+            chosen = num_bins
+            capacity[chosen] = max(max_workers, demand.max() if demand.size else 0)
+            num_bins += 1
+        usage[chosen, slots] += demand
+        assignment[job] = chosen
+
+    return assignment, usage[:num_bins], capacity[:num_bins]
+
+
+def _up_periods(run_bin, run_start, run_end, idle_minutes):
+    """
+    Splits each cluster's runs into up-periods: a cluster starts for a run when it is down and
+    auto-terminates once it has been idle for idle_minutes. Returns one row per period with its
+    cluster, start, end and the first run in it.
+    """
+    order = np.lexsort((run_start, run_bin))
+    bins, starts, ends = run_bin[order], run_start[order], run_end[order]
+    running_end = pd.Series(ends).groupby(bins).cummax().to_numpy()
+    new_period = np.ones(len(order), dtype=bool)
+    new_period[1:] = (bins[1:] != bins[:-1]) | (starts[1:] > running_end[:-1] + idle_minutes)
+    period = np.cumsum(new_period) - 1
+    first_runs = np.flatnonzero(new_period)
+    return pd.DataFrame({
+        "bin": bins[first_runs],
+        "start": starts[first_runs],
+        "end": pd.Series(ends).groupby(period).max().to_numpy(),
+        "first_run": order[first_runs],
+    })
+
+
+def plan_consolidation(jobs_df, year, month, max_cluster_workers=DEFAULT_MAX_CLUSTER_WORKERS,
+                       startup_minutes=DEFAULT_STARTUP_MINUTES, idle_minutes=DEFAULT_IDLE_MINUTES):
+    """
+    Plans shared clusters for the priced jobs (combine_calculated_jobs output).
+
+    Baseline: every job runs on its own cluster, as priced by calculate_databricks_costs_for_tier,
+    whose Nodes include the driver; start-up time is added per run when startup_minutes > 0.
+
+    Shared clusters: compatible jobs (COMPATIBILITY_COLUMNS) with at least one worker are packed
+    with first_fit_decreasing on their month of runs (expand_job_runs). Workers autoscale, so each
+    job keeps its worker node-hours. The overhead changes: a shared cluster runs one driver while
+    it is up (its runs plus idle_minutes after each up-period) and starts once per up-period,
+    where separate clusters pay a driver and a start-up for every run. Each cluster's ratio of
+    shared to separate overhead, simulated on the same runs, is applied to its jobs' driver and
+    start-up costs. Single-node jobs keep their own cluster.
+
+    Returns {"summary", "clusters", "assignments", "calculated_dbx_data" (the plan as a scenario),
+    "schedule_errors", "parameters"}.
+    """
+    jobs = coerce_schedule_numbers(jobs_df.reset_index(drop=True))
+    num_jobs = len(jobs)
+    nodes = jobs["Nodes"].astype(float).to_numpy()
+    node_hours = jobs["DBU Units"].astype(float).to_numpy()
+    dbu_cost = jobs["DBU Cost"].astype(float).to_numpy()
+    ec2_cost = jobs["EC2 Cost"].astype(float).to_numpy()
+    # Per node-hour rates straight from the calculator's own pricing
+    safe_hours = np.where(node_hours > 0, node_hours, 1.0)
+    dbu_rate, ec2_rate = dbu_cost / safe_hours, ec2_cost / safe_hours
+
+    startup_hours = np.where(node_hours > 0, jobs["Runs/Month"].astype(float).to_numpy() * nodes * startup_minutes / 60, 0.0)
+    baseline_dbu = dbu_cost + startup_hours * dbu_rate
+    baseline_ec2 = ec2_cost + startup_hours * ec2_rate
+
+    runs = expand_job_runs(jobs, year, month)
+    num_slots = -(-int(runs["end"].max() if runs["end"].size else 0) // SLOT_MINUTES) + 1
+    workers = nodes - DRIVER_NODES
+    runs_per_active_job = np.bincount(runs["job"], minlength=num_jobs)
+    eligible = (workers >= 1) & (node_hours > 0) & (runs_per_active_job > 0)
+
+    # Pack each compatibility group on its own; cluster ids are made global with an offset
+    assignment = np.full(num_jobs, -1, dtype=np.int64)
+    cluster_rows = []
+    group_codes, groups = pd.MultiIndex.from_frame(jobs[COMPATIBILITY_COLUMNS]).factorize()
+    run_order = np.argsort(runs["job"], kind="stable")
+    run_bounds = np.concatenate([[0], np.cumsum(runs_per_active_job)])
+    for code, (tier, instance, photon, spot) in enumerate(groups):
+        members = np.flatnonzero((group_codes == code) & eligible)
+        if members.size == 0:
+            continue
+        job_slots, job_demand = [], []
+        for job in members:
+            job_runs = run_order[run_bounds[job]:run_bounds[job + 1]]
+            slots, demand = _slot_demand(runs["start"][job_runs], runs["end"][job_runs], workers[job])
+            job_slots.append(slots)
+            job_demand.append(demand)
+        sizes = [demand.sum() for demand in job_demand]
+        local, usage, capacity = first_fit_decreasing(job_slots, job_demand, sizes, max_cluster_workers, num_slots)
+        offset = len(cluster_rows)
+        assignment[members] = local + offset
+        short_tier = tier.split(" / ")[-1]
+        short_instance = instance.split(" (")[0]
+        for b in range(len(capacity)):
+            cluster_rows.append({
+                "Cluster": f"{short_tier} · {short_instance}{' · Photon' if photon else ''}{' · Spot' if spot else ''} · #{b + 1}",
+                "Tier": tier, "Instance Type": instance, "Photon": bool(photon), "Spot": bool(spot),
+                "Jobs": int((local == b).sum()),
+                "Max Workers": float(capacity[b]),
+                "Peak Workers": float(usage[b].max()),
+            })
+
+    projected_dbu, projected_ec2 = baseline_dbu.copy(), baseline_ec2.copy()
+    clusters = pd.DataFrame(cluster_rows, columns=["Cluster", "Tier", "Instance Type", "Photon", "Spot", "Jobs", "Max Workers", "Peak Workers"])
+    if len(clusters):
+        packed = np.flatnonzero(assignment >= 0)
+        on_cluster = assignment[runs["job"]] >= 0
+        run_job = runs["job"][on_cluster]
+        periods = _up_periods(assignment[run_job], runs["start"][on_cluster], runs["end"][on_cluster], idle_minutes)
+        num_clusters = len(clusters)
+        period_hours = (periods["end"] - periods["start"] + idle_minutes + startup_minutes).to_numpy() / 60
+        driver_hours = np.bincount(periods["bin"], weights=period_hours * DRIVER_NODES, minlength=num_clusters)
+        opening_workers = workers[run_job[periods["first_run"].to_numpy()]]
+        startup_worker_hours = np.bincount(periods["bin"], weights=opening_workers * startup_minutes / 60, minlength=num_clusters)
+        shared_overhead_hours = driver_hours + startup_worker_hours
+
+        # The same runs on their own clusters: a driver for every run plus start-up of every node
+        run_hours = (runs["end"][on_cluster] - runs["start"][on_cluster]) / 60
+        own_overhead_hours = np.bincount(
+            assignment[run_job], weights=run_hours * DRIVER_NODES + nodes[run_job] * startup_minutes / 60, minlength=num_clusters
+        )
+        overhead_ratio = shared_overhead_hours / np.where(own_overhead_hours > 0, own_overhead_hours, 1.0)
+
+        # Workers autoscale, so a job keeps its worker node-hours; its driver and start-up hours
+        # (from the calculator's Runs/Month) scale by how much overhead its cluster saves
+        safe_nodes = np.where(nodes > 0, nodes, 1.0)
+        worker_hours = node_hours * workers / safe_nodes
+        job_overhead_hours = node_hours * DRIVER_NODES / safe_nodes + startup_hours
+        job_hours = worker_hours[packed] + job_overhead_hours[packed] * overhead_ratio[assignment[packed]]
+        projected_dbu[packed] = job_hours * dbu_rate[packed]
+        projected_ec2[packed] = job_hours * ec2_rate[packed]
+
+        clusters["Up-Periods"] = np.bincount(periods["bin"], minlength=num_clusters)
+        clusters["Driver Hours"] = driver_hours
+        clusters["Baseline Cost ($)"] = np.bincount(assignment[packed], weights=(baseline_dbu + baseline_ec2)[packed], minlength=num_clusters)
+        clusters["Projected Cost ($)"] = np.bincount(assignment[packed], weights=(projected_dbu + projected_ec2)[packed], minlength=num_clusters)
+        clusters["Savings ($)"] = clusters["Baseline Cost ($)"] - clusters["Projected Cost ($)"]
+
+    # Jobs left on their own cluster are assigned -1, which picks OWN_CLUSTER from the end
+    cluster_names = np.append(clusters["Cluster"].to_numpy(dtype=object), OWN_CLUSTER)
+    assignments = jobs[["Tier", "Job Name", "Instance Type", "Nodes", "Photon", "Spot"]].copy()
+    assignments["Cluster"] = cluster_names[assignment]
+    assignments["Baseline DBU ($)"] = baseline_dbu
+    assignments["Baseline EC2 ($)"] = baseline_ec2
+    assignments["Projected DBU ($)"] = projected_dbu
+    assignments["Projected EC2 ($)"] = projected_ec2
+    assignments["Savings ($)"] = (baseline_dbu + baseline_ec2) - (projected_dbu + projected_ec2)
+
+    summary = _summarize(assignments, clusters)
+
+    # The plan as a scenario: the calculator's tier tables with the projected costs
+    calculated_dbx_data = {}
+    for tier in pd.unique(jobs["Tier"]):
+        rows = np.flatnonzero(jobs["Tier"].to_numpy() == tier)
+        df = jobs.iloc[rows].drop(columns=["Tier", "Total Cost"], errors="ignore").reset_index(drop=True)
+        df["DBU Cost"] = projected_dbu[rows]
+        df["EC2 Cost"] = projected_ec2[rows]
+        calculated_dbx_data[tier] = {"df": df, "dbu_cost": df["DBU Cost"].sum(), "ec2_cost": df["EC2 Cost"].sum()}
+
+    return {
+        "summary": summary,
+        "clusters": clusters,
+        "assignments": assignments,
+        "calculated_dbx_data": calculated_dbx_data,
+        "schedule_errors": runs["schedule_errors"],
+        "parameters": {
+            "Year": year, "Month": month,
+            "Max Workers per Cluster": max_cluster_workers,
+            "Start-up Minutes": startup_minutes,
+            "Idle Minutes before Termination": idle_minutes,
+        },
+    }
+
+
+def _summarize(assignments, clusters):
+    """Per-tier and overall baseline vs projected costs."""
+    shared_clusters = clusters[clusters["Jobs"] > 1] if len(clusters) else clusters
+    shared_jobs = assignments["Cluster"].isin(shared_clusters["Cluster"])
+    grouped = assignments.assign(**{"Shared Jobs": shared_jobs}).groupby("Tier", sort=False).agg(**{
+        "Jobs": ("Job Name", "size"),
+        "Shared Jobs": ("Shared Jobs", "sum"),
+        "Baseline DBU ($)": ("Baseline DBU ($)", "sum"),
+        "Baseline EC2 ($)": ("Baseline EC2 ($)", "sum"),
+        "Projected DBU ($)": ("Projected DBU ($)", "sum"),
+        "Projected EC2 ($)": ("Projected EC2 ($)", "sum"),
+    }).reset_index()
+    grouped["Clusters"] = grouped["Tier"].map(clusters.groupby("Tier").size() if len(clusters) else {}).fillna(0).astype(int)
+    total = grouped.drop(columns="Tier").sum()
+    total["Tier"] = "Total"
+    summary = pd.concat([grouped, total.to_frame().T], ignore_index=True)
+    summary[["Jobs", "Shared Jobs", "Clusters"]] = summary[["Jobs", "Shared Jobs", "Clusters"]].astype(int)
+    cost_columns = ["Baseline DBU ($)", "Baseline EC2 ($)", "Projected DBU ($)", "Projected EC2 ($)"]
+    summary[cost_columns] = summary[cost_columns].astype(float)
+    summary["DBU Savings ($)"] = summary["Baseline DBU ($)"] - summary["Projected DBU ($)"]
+    summary["EC2 Savings ($)"] = summary["Baseline EC2 ($)"] - summary["Projected EC2 ($)"]
+    baseline = summary["Baseline DBU ($)"] + summary["Baseline EC2 ($)"]
+    savings = summary["DBU Savings ($)"] + summary["EC2 Savings ($)"]
+    summary["Savings %"] = np.where(baseline > 0, savings / baseline.where(baseline > 0, 1) * 100, 0.0)
+    return summary[["Tier", "Jobs", "Shared Jobs", "Clusters", "Baseline DBU ($)", "Baseline EC2 ($)", "Projected DBU ($)",
+                    "Projected EC2 ($)", "DBU Savings ($)", "EC2 Savings ($)", "Savings %"]]
+
+
+def fingerprint_plan_inputs(jobs_df):
+    """Hash of the columns the plan depends on, used as the cache key."""
+    if jobs_df.empty:
+        return "empty"
+    columns = [column for column in PLAN_COLUMNS if column in jobs_df.columns]
+    return hashlib.sha1(pd.util.hash_pandas_object(jobs_df[columns], index=False).values.tobytes()).hexdigest()
+
+
+@st.cache_data(max_entries=8, show_spinner="Packing jobs onto shared clusters...")
+def plan_consolidation_cached(fingerprint, _jobs_df, year, month, max_cluster_workers, startup_minutes, idle_minutes):
+    """plan_consolidation, cached on the input fingerprint and parameters."""
+    return plan_consolidation(_jobs_df, year, month, max_cluster_workers, startup_minutes, idle_minutes)
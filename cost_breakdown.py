@@ -0,0 +1,216 @@
+# cost_breakdown.py
+import hashlib
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+from data import INSTANCE_FAMILY_LOOKUP
+
+# Upper bounds that keep chart payloads small no matter how many jobs are configured
+DEFAULT_TOP_N = 25
+DEFAULT_HISTOGRAM_BINS = 30
+FIGURE_CACHE_ENTRIES = 32
+
+FINGERPRINT_COLUMNS = ["Tier", "Job Name", "Instance Type", "DBU Cost", "EC2 Cost"]
+
+
+def fingerprint_jobs(jobs_df):
+    """
+    Returns a short, stable hash of the columns the breakdown charts depend on.
+    Used as the cache key so figures are only rebuilt when the priced jobs change.
+    """
+    if jobs_df.empty:
+        return "empty"
+    row_hashes = pd.util.hash_pandas_object(jobs_df[FINGERPRINT_COLUMNS], index=False)
+    return hashlib.sha1(row_hashes.values.tobytes()).hexdigest()
+
+
+def add_instance_family(jobs_df):
+    """Adds an 'Instance Family' column derived from the 'Instance Type' label."""
+    df = jobs_df.copy()
+    df['Instance Family'] = df['Instance Type'].map(INSTANCE_FAMILY_LOOKUP).fillna("Other")
+    return df
+
+
+def _priced_jobs(jobs_df):
+    """Drops jobs whose Total Cost is NaN (a blank numeric cell); they cannot be ranked, binned or summed."""
+    return jobs_df[np.isfinite(jobs_df['Total Cost'].to_numpy(dtype=float))]
+
+
+def top_n_with_other(jobs_df, top_n=DEFAULT_TOP_N):
+    """
+    Returns the top_n most expensive jobs plus a single 'Other' row holding the rest,
+    with a cumulative share column for Pareto charts.
+    """
+    columns = ["Label", "DBU Cost", "EC2 Cost", "Total Cost", "Job Count", "Cumulative %"]
+    jobs_df = _priced_jobs(jobs_df)
+    if jobs_df.empty:
+        return pd.DataFrame(columns=columns)
+
+    grand_total = jobs_df['Total Cost'].sum()
+    # nlargest is a partial sort, so this stays cheap for large job counts
+    top = jobs_df.nlargest(top_n, 'Total Cost')
+    rest = jobs_df.drop(index=top.index)
+
+    # Job names repeat (every added row starts as 'New Job') and equal labels would share one
+    # bar, so repeated names are numbered by occurrence, as estimate_diff matches them
+    key = jobs_df[['Tier', 'Job Name']].astype(str)
+    occurrence = key.groupby(['Tier', 'Job Name']).cumcount().loc[top.index] + 1
+    repeated = key.duplicated(keep=False).loc[top.index]
+    labels = top['Tier'] + " · " + top['Job Name'].astype(str)
+    labels = labels.where(~repeated, labels + " #" + occurrence.astype(str))
+
+    summary = pd.DataFrame({
+        "Label": labels,
+        "DBU Cost": top['DBU Cost'],
+        "EC2 Cost": top['EC2 Cost'],
+        "Total Cost": top['Total Cost'],
+        "Job Count": 1,
+    })
+    if not rest.empty:
+        other = pd.DataFrame([{
+            "Label": f"Other ({len(rest)} jobs)",
+            "DBU Cost": rest['DBU Cost'].sum(),
+            "EC2 Cost": rest['EC2 Cost'].sum(),
+            "Total Cost": rest['Total Cost'].sum(),
+            "Job Count": len(rest),
+        }])
+        summary = pd.concat([summary, other], ignore_index=True)
+
+    summary = summary.reset_index(drop=True)
+    summary['Cumulative %'] = summary['Total Cost'].cumsum() / grand_total * 100 if grand_total > 0 else 0.0
+    return summary
+
+
+def cost_by_tier_and_family(jobs_df):
+    """Aggregates job costs by Tier, Instance Family and Instance Type for the treemap."""
+    df = add_instance_family(_priced_jobs(jobs_df))
+    return (
+        df.groupby(['Tier', 'Instance Family', 'Instance Type'], as_index=False, observed=True)
+        .agg(**{
+            "DBU Cost": ('DBU Cost', 'sum'),
+            "EC2 Cost": ('EC2 Cost', 'sum'),
+            "Total Cost": ('Total Cost', 'sum'),
+            "Job Count": ('Job Name', 'size'),
+        })
+    )
+
+
+def cost_by_family(jobs_df):
+    """Aggregates DBU and EC2 costs by instance family."""
+    df = add_instance_family(_priced_jobs(jobs_df))
+    return (
+        df.groupby('Instance Family', as_index=False, observed=True)[['DBU Cost', 'EC2 Cost', 'Total Cost']]
+        .sum()
+        .sort_values('Total Cost', ascending=False)
+    )
+
+
+def bin_job_costs(jobs_df, bins=DEFAULT_HISTOGRAM_BINS):
+    """Bins per-job total cost into a fixed number of buckets (job count and cost per bucket)."""
+    costs = jobs_df['Total Cost'].to_numpy(dtype=float)
+    costs = costs[np.isfinite(costs)]
+    if costs.size == 0:
+        return pd.DataFrame(columns=["Bin Start", "Bin End", "Job Count", "Total Cost"])
+
+    counts, edges = np.histogram(costs, bins=bins)
+    cost_sums, _ = np.histogram(costs, bins=edges, weights=costs)
+    return pd.DataFrame({
+        "Bin Start": edges[:-1],
+        "Bin End": edges[1:],
+        "Job Count": counts,
+        "Total Cost": cost_sums,
+    })
+
+
+# --- Cached figure builders ---
+# The leading underscore on the DataFrame argument tells Streamlit not to hash it;
+# the fingerprint already identifies the input, so cache lookups are O(1) in job count.
+
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def build_pareto_figure(fingerprint, _jobs_df, top_n=DEFAULT_TOP_N):
+    """Bar chart of the top_n jobs (plus 'Other') with a cumulative share line."""
+    summary = top_n_with_other(_jobs_df, top_n)
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=summary['Label'], y=summary['DBU Cost'], name="DBU Cost", marker_color='#FF8C00'))
+    fig.add_trace(go.Bar(x=summary['Label'], y=summary['EC2 Cost'], name="EC2 Cost", marker_color='#1E90FF'))
+    fig.add_trace(go.Scatter(
+        x=summary['Label'], y=summary['Cumulative %'], name="Cumulative %",
+        yaxis="y2", mode="lines+markers", marker_color='#3CB371'
+    ))
+    fig.update_layout(
+        barmode="stack",
+        yaxis=dict(title="Monthly Cost ($)"),
+        yaxis2=dict(title="Cumulative %", overlaying="y", side="right", range=[0, 105]),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
+        margin=dict(t=30, b=0, l=0, r=0),
+        height=400
+    )
+    return fig
+
+
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def build_treemap_figure(fingerprint, _jobs_df):
+    """Treemap of cost by Tier > Instance Family > Instance Type."""
+    grouped = cost_by_tier_and_family(_jobs_df)
+    grouped = grouped[grouped['Total Cost'] > 0]
+
+    # Treemaps need explicit parent nodes, so build the three levels from the aggregate
+    ids, labels, parents, values = [], [], [], []
+    for tier, tier_total in grouped.groupby('Tier')['Total Cost'].sum().items():
+        ids.append(tier)
+        labels.append(tier)
+        parents.append("")
+        values.append(tier_total)
+    for (tier, family), family_total in grouped.groupby(['Tier', 'Instance Family'])['Total Cost'].sum().items():
+        ids.append(f"{tier}/{family}")
+        labels.append(family)
+        parents.append(tier)
+        values.append(family_total)
+    for tier, family, instance, total in zip(grouped['Tier'], grouped['Instance Family'], grouped['Instance Type'], grouped['Total Cost']):
+        ids.append(f"{tier}/{family}/{instance}")
+        labels.append(instance)
+        parents.append(f"{tier}/{family}")
+        values.append(total)
+
+    fig = go.Figure(go.Treemap(
+        ids=ids, labels=labels, parents=parents, values=values,
+        branchvalues="total", hovertemplate="%{label}<br>$%{value:,.2f}<extra></extra>"
+    ))
+    fig.update_layout(margin=dict(t=0, b=0, l=0, r=0), height=400)
+    return fig
+
+
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def build_family_figure(fingerprint, _jobs_df):
+    """Stacked bar chart of DBU and EC2 cost per instance family."""
+    grouped = cost_by_family(_jobs_df)
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=grouped['Instance Family'], y=grouped['DBU Cost'], name="DBU Cost", marker_color='#FF8C00'))
+    fig.add_trace(go.Bar(x=grouped['Instance Family'], y=grouped['EC2 Cost'], name="EC2 Cost", marker_color='#1E90FF'))
+    fig.update_layout(
+        barmode="stack",
+        yaxis=dict(title="Monthly Cost ($)"),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
+        margin=dict(t=30, b=0, l=0, r=0),
+        height=350
+    )
+    return fig
+
+
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def build_histogram_figure(fingerprint, _jobs_df, bins=DEFAULT_HISTOGRAM_BINS):
+    """Histogram of per-job monthly cost, pre-binned server-side."""
+    binned = bin_job_costs(_jobs_df, bins)
+    labels = [f"${start:,.0f} – ${end:,.0f}" for start, end in zip(binned['Bin Start'], binned['Bin End'])]
+    fig = go.Figure(go.Bar(
+        x=labels, y=binned['Job Count'], customdata=binned['Total Cost'], marker_color='#3CB371',
+        hovertemplate="%{x}<br>%{y} jobs<br>$%{customdata:,.2f}<extra></extra>"
+    ))
+    fig.update_layout(
+        xaxis=dict(title="Monthly Cost per Job"),
+        yaxis=dict(title="Jobs"),
+        margin=dict(t=0, b=0, l=0, r=0),
+        height=350
+    )
+    return fig
@@ -1,5 +1,8 @@
 # data.py
 
+# Identifies the price tables below in exported estimates
+PRICING_VERSION = "sample-us-east-1-v1"
+
 # AWS EC2 Instance Pricing (USD per hour) - Sample Data for us-east-1
 INSTANCE_PRICES = {
     "General Purpose": {
@@ -21,6 +24,8 @@ INSTANCE_PRICES = {
 # Flatten the instance list for the selectbox, but keep the prices separate for lookup
 FLAT_INSTANCE_LIST = {f"{k} ({fam})": p for fam, instances in INSTANCE_PRICES.items() for k, p in instances.items()}
 INSTANCE_LIST = list(FLAT_INSTANCE_LIST.keys())
+# Reverse lookup from the selectbox label to its instance family, used for cost breakdowns
+INSTANCE_FAMILY_LOOKUP = {f"{k} ({fam})": fam for fam, instances in INSTANCE_PRICES.items() for k in instances}
 
 # Databricks DBU Rates (USD per DBU)
 DBU_RATES = {
@@ -28,6 +33,17 @@ DBU_RATES = {
     "L1 / Silver": 0.30,
     "L2 / Gold": 0.60
 }
+# Commitment discounts off list price, by term in months. Each term lists (monthly commit in USD, discount)
+# breakpoints; the highest breakpoint not above the commit applies. Sample figures - use negotiated rates.
+DBU_COMMIT_DISCOUNTS = {
+    12: [(0, 0.06), (5000, 0.10), (25000, 0.15)],
+    24: [(0, 0.10), (5000, 0.14), (25000, 0.20)],
+    36: [(0, 0.15), (5000, 0.20), (25000, 0.27)],
+}
+EC2_SAVINGS_PLAN_DISCOUNTS = {
+    12: [(0, 0.27)],
+    36: [(0, 0.46)],
+}
 # Constants for calculation
 PHOTON_PREMIUM_MULTIPLIER = 1.2 # 20% cost increase
 SPOT_DISCOUNT_MULTIPLIER = 0.3 # 70% discount means you pay 30%
@@ -56,4 +72,7 @@ SQL_WAREHOUSE_PRICING = {
 # Create a user-friendly list for the selectbox
 SQL_WAREHOUSE_SIZES = [f"{size} - {data['dbt_per_hr']} DBUs - ${data['cost_per_hr']}/hr" for size, data in SQL_WAREHOUSE_PRICING.items()]
 # --- END OF UPDATE ---
-SQL_WAREHOUSE_TYPES = ["Classic", "Pro", "Serverless"]
\ No newline at end of file
+SQL_WAREHOUSE_TYPES = ["Classic", "Pro", "Serverless"]
+
+# Chargeback tags carried by jobs, S3 zones/tables and SQL warehouses
+TAG_FIELDS = ["Team", "Cost Center", "Project"]
\ No newline at end of file
@@ -0,0 +1,203 @@
+# estimate_diff.py
+import numpy as np
+import pandas as pd
+from calculations import combine_calculated_jobs, calculate_s3_cost_per_zone, calculate_sql_warehouse_cost_per_warehouse
+from arrow_interchange import read_estimate_tables, tables_to_estimate
+
+JOB_KEY_COLUMNS = ["Tier", "Job Name", "Occurrence"]
+JOB_CONFIG_COLUMNS = ["Runtime (hrs)", "Runs/Month", "Instance Type", "Nodes", "Photon", "Spot"]
+JOB_NUMERIC_CONFIG_COLUMNS = ["Runtime (hrs)", "Runs/Month", "Nodes"]
+JOB_COST_COLUMNS = ["DBU Cost", "EC2 Cost", "Total Cost"]
+
+# Column names used by generate_consolidated_excel_export, mapped back to the calculator's names
+EXCEL_JOB_COLUMNS = {
+    'Tier': 'Tier',
+    'Name': 'Job Name',
+    'Runtime Hours': 'Runtime (hrs)',
+    'Runs per Month': 'Runs/Month',
+    'Instance': 'Instance Type',
+    'Nodes': 'Nodes',
+    'Photon Enabled': 'Photon',
+    'Spot Instance': 'Spot',
+    'Calculated DBU Cost ($)': 'DBU Cost',
+    'Calculated EC2 Cost ($)': 'EC2 Cost',
+}
+
+
+def build_estimate(calculated_dbx_data, s3_costs_per_zone, sql_warehouses_config, sql_costs_per_warehouse=None):
+    """
+    Captures a calculated estimate in the flat form used for comparisons:
+    one jobs table, one S3 zone table and one SQL warehouse table.
+    Warehouse costs are re-priced unless sql_costs_per_warehouse is given.
+    """
+    if sql_costs_per_warehouse is None:
+        sql_costs_per_warehouse = calculate_sql_warehouse_cost_per_warehouse(sql_warehouses_config)
+
+    jobs = combine_calculated_jobs(calculated_dbx_data)
+    jobs = jobs[["Tier", "Job Name"] + JOB_CONFIG_COLUMNS + JOB_COST_COLUMNS].reset_index(drop=True)
+    # A cleared editor cell leaves None, which would drop out of the occurrence numbering
+    jobs["Job Name"] = jobs["Job Name"].fillna("").astype(str)
+
+    s3_zones = pd.DataFrame({
+        "Zone": list(s3_costs_per_zone.keys()),
+        "Cost": list(s3_costs_per_zone.values()),
+    })
+    warehouses = pd.DataFrame({
+        "Name": [wh["name"] for wh in sql_warehouses_config],
+        "Cost": sql_costs_per_warehouse,
+    })
+    return {"jobs": jobs, "s3_zones": s3_zones, "warehouses": warehouses}
+
+
+def load_estimate_from_excel(file):
+    """
+    Rebuilds an estimate from a workbook produced by generate_consolidated_excel_export.
+    S3 costs are re-priced from the exported zone configuration.
+    """
+    sheets = pd.read_excel(file, sheet_name=None)
+
+    jobs = sheets.get("Databricks_Jobs", pd.DataFrame(columns=list(EXCEL_JOB_COLUMNS.keys())))
+    jobs = jobs[list(EXCEL_JOB_COLUMNS.keys())].rename(columns=EXCEL_JOB_COLUMNS)
+    jobs["Job Name"] = jobs["Job Name"].fillna("").astype(str)
+    jobs[["DBU Cost", "EC2 Cost"]] = jobs[["DBU Cost", "EC2 Cost"]].fillna(0).astype(float)
+    jobs["Total Cost"] = jobs["DBU Cost"] + jobs["EC2 Cost"]
+
+    if "S3_Direct_Storage" in sheets:
+        direct_config = {
+            row["Zone"]: {
+                "class": row["Storage Class"],
+                "amount": row["Storage Amount"],
+                "unit": row["Unit"],
+                "monthly_growth_percent": row["Monthly Growth %"],
+            } for row in sheets["S3_Direct_Storage"].to_dict(orient="records")
+        }
+        s3_costs_per_zone, _, _ = calculate_s3_cost_per_zone("Direct Storage", direct_config, {})
+    else:
+        table_config = {}
+        for row in sheets.get("S3_Table_Based_Storage", pd.DataFrame()).to_dict(orient="records"):
+            table_config.setdefault(row["Zone"], []).append(row)
+        s3_costs_per_zone, _, _ = calculate_s3_cost_per_zone("Table-Based", {}, table_config)
+
+    sql_sheet = sheets.get("SQL_Warehouses", pd.DataFrame(columns=["Name", "Monthly Cost ($)"]))
+    warehouses = pd.DataFrame({
+        "Name": sql_sheet["Name"].astype(str),
+        "Cost": sql_sheet["Monthly Cost ($)"].astype(float),
+    })
+
+    return {
+        "jobs": jobs,
+        "s3_zones": pd.DataFrame({"Zone": list(s3_costs_per_zone.keys()), "Cost": list(s3_costs_per_zone.values())}),
+        "warehouses": warehouses,
+    }
+
+
+def load_estimate_from_bundle(file):
+    """Rebuilds an estimate from a Parquet/Arrow bundle, keeping the costs as exported."""
+    exported = tables_to_estimate(read_estimate_tables(file))
+    return build_estimate(
+        exported["calculated_dbx_data"],
+        exported["s3_costs_per_zone"],
+        exported["sql_warehouses"],
+        exported["sql_costs_per_warehouse"]
+    )
+
+
+def _status_from_merge(merged, delta_columns):
+    """Maps the merge indicator (and any non-zero delta) onto Added / Removed / Changed / Unchanged."""
+    indicator = merged.pop("_merge").to_numpy()
+    changed = np.zeros(len(merged), dtype=bool)
+    for column in delta_columns:
+        changed |= ~np.isclose(merged[column].to_numpy(dtype=float), 0.0)
+    return np.select(
+        [indicator == "right_only", indicator == "left_only", changed],
+        ["Added", "Removed", "Changed"],
+        default="Unchanged"
+    )
+
+
+def diff_jobs(before_jobs, after_jobs):
+    """
+    Aligns two job tables on (Tier, Job Name) with a hash join and returns one row per job
+    with before/after costs, deltas, a status and the configuration fields that changed.
+    Duplicate job names within a tier are paired in order of appearance.
+    """
+    before = before_jobs.copy()
+    after = after_jobs.copy()
+    # Blank names must pair up like any other name; NaN keys would join many-to-many
+    before["Job Name"] = before["Job Name"].fillna("").astype(str)
+    after["Job Name"] = after["Job Name"].fillna("").astype(str)
+    before["Occurrence"] = before.groupby(["Tier", "Job Name"]).cumcount()
+    after["Occurrence"] = after.groupby(["Tier", "Job Name"]).cumcount()
+
+    merged = before.merge(
+        after, on=JOB_KEY_COLUMNS, how="outer", suffixes=(" (Before)", " (After)"), indicator=True
+    )
+
+    for column in JOB_COST_COLUMNS:
+        merged[f"{column} (Before)"] = merged[f"{column} (Before)"].fillna(0.0)
+        merged[f"{column} (After)"] = merged[f"{column} (After)"].fillna(0.0)
+        merged[f"{column} Δ"] = merged[f"{column} (After)"] - merged[f"{column} (Before)"]
+
+    # Build a comma separated list of changed configuration fields without a per-row Python loop
+    changed_fields = pd.Series("", index=merged.index)
+    both = (merged["_merge"] == "both").to_numpy()
+    for column in JOB_CONFIG_COLUMNS:
+        before_values = merged[f"{column} (Before)"]
+        after_values = merged[f"{column} (After)"]
+        if column in JOB_NUMERIC_CONFIG_COLUMNS:
+            differs = ~np.isclose(
+                pd.to_numeric(before_values, errors="coerce").fillna(0).to_numpy(dtype=float),
+                pd.to_numeric(after_values, errors="coerce").fillna(0).to_numpy(dtype=float)
+            )
+        else:
+            # Two blank values are equal, not changed
+            differs = (before_values.ne(after_values) & ~(before_values.isna() & after_values.isna())).to_numpy()
+        differs = differs & both
+        prefix = changed_fields.where(changed_fields == "", changed_fields + ", ")
+        changed_fields = changed_fields.mask(differs, prefix + column)
+    merged["Changed Fields"] = changed_fields
+
+    merged["Status"] = _status_from_merge(merged, [f"{column} Δ" for column in JOB_COST_COLUMNS])
+    merged.loc[(merged["Status"] == "Unchanged") & (merged["Changed Fields"] != ""), "Status"] = "Changed"
+
+    ordered = ["Status", "Tier", "Job Name", "Changed Fields"] + [
+        f"{column}{suffix}" for column in JOB_COST_COLUMNS for suffix in (" (Before)", " (After)", " Δ")
+    ]
+    return merged[ordered].sort_values("Total Cost Δ", key=np.abs, ascending=False, kind="stable").reset_index(drop=True)
+
+
+def diff_costs_by_key(before_df, after_df, key):
+    """Outer-joins two single-cost tables on key (with duplicate keys paired in order) and returns deltas."""
+    before = before_df.copy()
+    after = after_df.copy()
+    before[key] = before[key].fillna("").astype(str)
+    after[key] = after[key].fillna("").astype(str)
+    before["Occurrence"] = before.groupby(key).cumcount()
+    after["Occurrence"] = after.groupby(key).cumcount()
+
+    merged = before.merge(after, on=[key, "Occurrence"], how="outer", suffixes=(" (Before)", " (After)"), indicator=True)
+    merged["Cost (Before)"] = merged["Cost (Before)"].fillna(0.0)
+    merged["Cost (After)"] = merged["Cost (After)"].fillna(0.0)
+    merged["Cost Δ"] = merged["Cost (After)"] - merged["Cost (Before)"]
+    merged["Status"] = _status_from_merge(merged, ["Cost Δ"])
+    return merged[["Status", key, "Cost (Before)", "Cost (After)", "Cost Δ"]].reset_index(drop=True)
+
+
+def diff_estimates(before, after):
+    """
+    Compares two estimates built by build_estimate / load_estimate_from_excel.
+    Returns the job, S3 zone and SQL warehouse diffs plus a per-category summary.
+    """
+    jobs = diff_jobs(before["jobs"], after["jobs"])
+    s3_zones = diff_costs_by_key(before["s3_zones"], after["s3_zones"], "Zone")
+    warehouses = diff_costs_by_key(before["warehouses"], after["warehouses"], "Name")
+
+    summary = pd.DataFrame([
+        {"Category": "Databricks DBU", "Before": jobs["DBU Cost (Before)"].sum(), "After": jobs["DBU Cost (After)"].sum()},
+        {"Category": "Databricks EC2", "Before": jobs["EC2 Cost (Before)"].sum(), "After": jobs["EC2 Cost (After)"].sum()},
+        {"Category": "S3 Storage", "Before": s3_zones["Cost (Before)"].sum(), "After": s3_zones["Cost (After)"].sum()},
+        {"Category": "SQL Warehouse", "Before": warehouses["Cost (Before)"].sum(), "After": warehouses["Cost (After)"].sum()},
+    ])
+    summary["Δ"] = summary["After"] - summary["Before"]
+
+    return {"summary": summary, "jobs": jobs, "s3_zones": s3_zones, "warehouses": warehouses}
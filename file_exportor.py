@@ -1,15 +1,18 @@
 # excel_exporter.py
 import io
 import pandas as pd
+import streamlit as st
 import xlsxwriter # Ensure xlsxwriter is installed: pip install xlsxwriter
 
 # Import necessary data for calculations within the exporter
-from data import SQL_WAREHOUSE_PRICING, DBU_RATES # DBU_RATES for tier names if needed, SQL_WAREHOUSE_PRICING for details
+from data import SQL_WAREHOUSE_PRICING, DBU_RATES, TAG_FIELDS # DBU_RATES for tier names if needed, SQL_WAREHOUSE_PRICING for details
+from chargeback import GROUP_DIMENSIONS as CHARGEBACK_DIMENSIONS
 
 
-def generate_consolidated_excel_export(calculated_dbx_data, s3_calc_method, s3_direct_config, s3_table_based_config, sql_warehouses_config):
+def generate_consolidated_excel_export(calculated_dbx_data, s3_calc_method, s3_direct_config, s3_table_based_config, sql_warehouses_config, sensitivity_df=None):
     """
     Generates a consolidated Excel file with multiple sheets for different cost categories.
+    A 'Sensitivity' sheet is added when a sensitivity analysis DataFrame is passed.
     """
     output = io.BytesIO()
     with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
@@ -47,8 +50,8 @@ def generate_consolidated_excel_export(calculated_dbx_data, s3_calc_method, s3_d
             ordered_cols_dbx = [
                 'Tier', 'Job No', 'Name', 'Runtime Hours', 'Runs per Month', 'Instance',
                 'Nodes', 'Photon Enabled', 'Spot Instance', 'Calculated DBU Units',
-                'Calculated DBU Cost ($)', 'Calculated EC2 Cost ($)'
-            ]
+                'Calculated DBU Cost ($)', 'Calculated EC2 Cost ($)', 'Schedule'
+            ] + TAG_FIELDS
             # Ensure only relevant columns are kept and in order
             # The 'df' from calculated_dbx_data should only contain the columns from calculations.py
             # plus the new 'Tier' column.
@@ -60,8 +63,8 @@ def generate_consolidated_excel_export(calculated_dbx_data, s3_calc_method, s3_d
             empty_dbx_df = pd.DataFrame(columns=[
                 'Tier', 'Job No', 'Name', 'Runtime Hours', 'Runs per Month', 'Instance',
                 'Nodes', 'Photon Enabled', 'Spot Instance', 'Calculated DBU Units',
-                'Calculated DBU Cost ($)', 'Calculated EC2 Cost ($)'
-            ])
+                'Calculated DBU Cost ($)', 'Calculated EC2 Cost ($)', 'Schedule'
+            ] + TAG_FIELDS)
             empty_dbx_df.to_excel(writer, sheet_name="Databricks_Jobs", index=False)
 
 
@@ -132,20 +135,71 @@ def generate_consolidated_excel_export(calculated_dbx_data, s3_calc_method, s3_d
                     "Hours per Day": wh["hours_per_day"],
                     "Days per Month": wh["days_per_month"],
                     "Monthly Cost ($)": hourly_rate * wh["hours_per_day"] * wh["days_per_month"],
+                    **{tag: wh.get("tags", {}).get(tag, "") for tag in TAG_FIELDS},
                 })
             df_sql = pd.DataFrame(warehouse_data)
             ordered_cols_sql = [
                 "Name", "Type", "Size", "DBUs per Hour", "Hourly Rate ($)",
                 "Hours per Day", "Days per Month", "Monthly Cost ($)"
-            ]
+            ] + TAG_FIELDS
             df_sql = df_sql[ordered_cols_sql]
             df_sql.to_excel(writer, sheet_name='SQL_Warehouses', index=False)
         else:
             empty_sql_df = pd.DataFrame(columns=[
                 "Name", "Type", "Size", "DBUs per Hour", "Hourly Rate ($)",
                 "Hours per Day", "Days per Month", "Monthly Cost ($)"
-            ])
+            ] + TAG_FIELDS)
             empty_sql_df.to_excel(writer, sheet_name='SQL_Warehouses', index=False)
 
+        # 4. Sensitivity Sheet (optional)
+        if sensitivity_df is not None:
+            sensitivity_df.to_excel(writer, sheet_name='Sensitivity', index=False)
+
+    output.seek(0)
+    return output.getvalue()
+
+def generate_chargeback_excel_export(chargeback_index, selected_dimensions):
+    """
+    Generates a chargeback Excel file: one sheet per single dimension, one for the
+    selected combination of dimensions, and the underlying line items.
+    """
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        sheets = [(dimension,) for dimension in CHARGEBACK_DIMENSIONS]
+        if len(selected_dimensions) > 1:
+            sheets.append(tuple(selected_dimensions))
+
+        for dimensions in sheets:
+            # Excel limits sheet names to 31 characters
+            sheet_name = ("By " + " & ".join(dimensions))[:31]
+            chargeback_index.aggregate(dimensions).to_excel(writer, sheet_name=sheet_name, index=False)
+
+        chargeback_index.items.to_excel(writer, sheet_name="Line_Items", index=False)
+
     output.seek(0)
-    return output.getvalue()
\ No newline at end of file
+    return output.getvalue()
+
+@st.cache_data(max_entries=4, show_spinner="Writing chargeback workbook...")
+def generate_chargeback_excel_export_cached(fingerprint, _chargeback_index, selected_dimensions):
+    """generate_chargeback_excel_export, cached on the index fingerprint and the selected dimensions."""
+    return generate_chargeback_excel_export(_chargeback_index, list(selected_dimensions))
+
+def generate_consolidation_excel_export(plan):
+    """
+    Generates the cluster consolidation plan as an Excel file: the savings summary,
+    one row per shared cluster, every job's cluster assignment and the planner parameters.
+    """
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        plan["summary"].to_excel(writer, sheet_name="Summary", index=False)
+        plan["clusters"].to_excel(writer, sheet_name="Clusters", index=False)
+        plan["assignments"].to_excel(writer, sheet_name="Assignments", index=False)
+        pd.DataFrame(list(plan["parameters"].items()), columns=["Parameter", "Value"]).to_excel(writer, sheet_name="Parameters", index=False)
+
+    output.seek(0)
+    return output.getvalue()
+
+@st.cache_data(max_entries=4, show_spinner="Writing consolidation workbook...")
+def generate_consolidation_excel_export_cached(fingerprint, _plan, year, month, max_cluster_workers, startup_minutes, idle_minutes):
+    """generate_consolidation_excel_export, cached on the same key as plan_consolidation_cached."""
+    return generate_consolidation_excel_export(_plan)
@@ -0,0 +1,124 @@
+# history.py
+import copy
+from collections import deque
+
+DEFAULT_HISTORY_DEPTH = 50
+
+# Widgets keyed on estimate values; their stored state has to be dropped after an undo/redo,
+# otherwise they would write their old values straight back over the restored estimate
+WIDGET_KEY_PREFIXES = (
+    "num_jobs_", "editor_",
+    "s3_class_", "s3_amount_", "s3_unit_", "s3_growth_", "s3_tag_", "s3_table_editor_",
+    "sql_name_", "sql_type_", "sql_size_", "sql_hours_", "sql_days_", "sql_tag_",
+)
+
+
+def _share_or_copy(previous, value):
+    """Reuses the previous snapshot's piece when the value is unchanged, otherwise freezes a private copy."""
+    if previous is not None and previous == value:
+        return previous
+    return copy.deepcopy(value)
+
+
+class EstimateHistory:
+    """
+    Undo/redo history of the estimate inputs built from structurally shared snapshots.
+
+    A snapshot is a flat dict of pieces: one per Databricks tier, S3 zone (direct config, tables
+    and tags) and SQL warehouse. Job DataFrames are never modified in place by the app (edits
+    replace the tier's frame), so they are shared by reference. The small config dicts are edited
+    in place by widgets, so each is compared with the previous snapshot's copy and only copied
+    again when it changed. A snapshot therefore costs one dict of references, independent of the
+    number of jobs, and the history only keeps alive the pieces that were actually edited.
+    """
+
+    def __init__(self, depth=DEFAULT_HISTORY_DEPTH):
+        self.undo_stack = deque(maxlen=depth)
+        self.redo_stack = deque(maxlen=depth)
+        self.current = None
+
+    @property
+    def depth(self):
+        return self.undo_stack.maxlen
+
+    def _snapshot(self, state):
+        previous = self.current or {}
+        pieces = {("s3_calc_method",): _share_or_copy(previous.get(("s3_calc_method",)), state["s3_calc_method"])}
+        for tier, jobs_df in state["dbx_jobs"].items():
+            pieces[("dbx_jobs", tier)] = jobs_df
+        for zone, config in state["s3_direct"].items():
+            pieces[("s3_direct", zone)] = _share_or_copy(previous.get(("s3_direct", zone)), config)
+        for zone, tables in state["s3_table_based"].items():
+            pieces[("s3_table_based", zone)] = _share_or_copy(previous.get(("s3_table_based", zone)), tables)
+        for zone, tags in state["s3_zone_tags"].items():
+            pieces[("s3_zone_tags", zone)] = _share_or_copy(previous.get(("s3_zone_tags", zone)), tags)
+        for i, warehouse in enumerate(state["sql_warehouses"]):
+            pieces[("sql_warehouses", i)] = _share_or_copy(previous.get(("sql_warehouses", i)), warehouse)
+        return pieces
+
+    def _changed(self, snapshot):
+        if self.current is None or snapshot.keys() != self.current.keys():
+            return True
+        return any(piece is not self.current[key] for key, piece in snapshot.items())
+
+    def capture(self, state):
+        """
+        Records the estimate in state as a new step if it differs from the current one.
+        A new step discards the redo stack. Returns True when a step was recorded.
+        """
+        snapshot = self._snapshot(state)
+        if self.current is None:
+            self.current = snapshot
+            return False
+        if not self._changed(snapshot):
+            return False
+        self.undo_stack.append(self.current)
+        self.redo_stack.clear()
+        self.current = snapshot
+        return True
+
+    def undo(self, state):
+        """Restores the previous step into state. Pending edits are captured first so they can be redone."""
+        self.capture(state)
+        if not self.undo_stack:
+            return False
+        self.redo_stack.append(self.current)
+        self.current = self.undo_stack.pop()
+        self._restore(state)
+        return True
+
+    def redo(self, state):
+        """Re-applies the most recently undone step."""
+        self.capture(state)
+        if not self.redo_stack:
+            return False
+        self.undo_stack.append(self.current)
+        self.current = self.redo_stack.pop()
+        self._restore(state)
+        return True
+
+    def _restore(self, state):
+        """Writes the current snapshot back into state. Shared frozen pieces are copied so later edits cannot reach them."""
+        dbx_jobs, s3_direct, s3_table_based, s3_zone_tags, warehouses = {}, {}, {}, {}, []
+        for key, piece in self.current.items():
+            if key[0] == "s3_calc_method":
+                state["s3_calc_method"] = piece
+            elif key[0] == "dbx_jobs":
+                dbx_jobs[key[1]] = piece
+            elif key[0] == "s3_direct":
+                s3_direct[key[1]] = copy.deepcopy(piece)
+            elif key[0] == "s3_table_based":
+                s3_table_based[key[1]] = copy.deepcopy(piece)
+            elif key[0] == "s3_zone_tags":
+                s3_zone_tags[key[1]] = copy.deepcopy(piece)
+            elif key[0] == "sql_warehouses":
+                warehouses.append(copy.deepcopy(piece))
+        state["dbx_jobs"] = dbx_jobs
+        state["s3_direct"] = s3_direct
+        state["s3_table_based"] = s3_table_based
+        state["s3_zone_tags"] = s3_zone_tags
+        state["sql_warehouses"] = warehouses
+
+        for key in list(state.keys()):
+            if isinstance(key, str) and key.startswith(WIDGET_KEY_PREFIXES):
+                del state[key]
@@ -0,0 +1,322 @@
+# load_test.py
+# Concurrent-session load test for main.py, driven headlessly through Streamlit's AppTest.
+#
+# Usage:
+#   python load_test.py --sessions 20 --jobs-per-tier 200 --warehouses 10
+#   python load_test.py --sessions 8 --script add_jobs,toggle_spot --repeat 5 --output samples.csv
+#
+# Every session gets its own seeded inventory, then replays the edit script. AppTest is not
+# thread-safe (each run() swaps the process-global Runtime instance), so every session runs in its
+# own worker process; CPU time and peak RSS are therefore measured per session.
+import argparse
+import multiprocessing
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from streamlit import config as st_config
+from streamlit.logger import set_log_level
+from streamlit.testing.v1 import AppTest
+from data import DBU_RATES, INSTANCE_LIST, S3_STORAGE_CLASSES, SQL_WAREHOUSE_SIZES, SQL_WAREHOUSE_TYPES, TAG_FIELDS
+
+try:
+    import resource  # Unix only; RSS is not reported elsewhere
+except ImportError:
+    resource = None
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+DEFAULT_TIMEOUT = 120
+PERCENTILES = [50, 90, 95, 99]
+TEAMS = ["Data Platform", "Analytics", "Finance", "Marketing"]
+S3_ZONES = ["Landing Zone", "L0 / Bronze", "L1 / Silver", "L2 / Gold"]
+# Rendered last by main.py, so a rerun without it did not run the script to completion
+COMPLETED_RUN_KEY = "undo_estimate_button"
+
+
+def build_inventory(jobs_per_tier=50, tables_per_zone=5, num_warehouses=3, seed=0):
+    """
+    Builds a random but realistic session state inventory. Only the keys initialize_state owns are
+    set, so the app's own initialization and migrations still run on top of it.
+    """
+    rng = np.random.default_rng(seed)
+    dbx_jobs = {}
+    for tier in DBU_RATES.keys():
+        n = jobs_per_tier
+        dbx_jobs[tier] = pd.DataFrame({
+            "#": np.arange(1, n + 1),
+            "Job Name": [f"{tier.split(' / ')[1]} Job {i + 1}" for i in range(n)],
+            "Runtime (hrs)": rng.integers(1, 9, n).astype(float) / 2,
+            "Runs/Month": rng.integers(1, 31, n),
+            "Instance Type": rng.choice(INSTANCE_LIST, n),
+            "Nodes": rng.integers(1, 9, n),
+            "Photon": rng.random(n) < 0.3,
+            "Spot": rng.random(n) < 0.3,
+            "Schedule": rng.choice(["", "0 2 * * *", "*/30 * * * *", "0 6 * * 1-5"], n),
+            "Team": rng.choice(TEAMS, n),
+            **{tag: "" for tag in TAG_FIELDS if tag != "Team"},
+        })
+
+    s3_direct = {
+        zone: {"class": str(rng.choice(S3_STORAGE_CLASSES)), "amount": int(rng.integers(100, 50_000)), "unit": "GB",
+               "put": 0, "get": 0, "monthly_growth_percent": float(rng.integers(0, 6))}
+        for zone in S3_ZONES
+    }
+    s3_table_based = {
+        zone: [{"Table Name": f"{zone.replace(' / ', '_')}_Table_{i + 1}", "Records": int(rng.integers(10_000, 10_000_000)),
+                "Columns": int(rng.integers(5, 60))} for i in range(tables_per_zone)]
+        for zone in S3_ZONES
+    }
+    sql_warehouses = [{
+        "id": f"warehouse_{i}", "name": f"Warehouse {i + 1}",
+        "type": str(rng.choice(SQL_WAREHOUSE_TYPES)), "size": str(rng.choice(SQL_WAREHOUSE_SIZES)),
+        "hours_per_day": int(rng.integers(1, 25)), "days_per_month": int(rng.integers(1, 32)),
+        "auto_suspend": True, "suspend_after": 10,
+        "tags": {tag: "" for tag in TAG_FIELDS},
+    } for i in range(num_warehouses)]
+
+    return {
+        "dbx_jobs": dbx_jobs,
+        "s3_direct": s3_direct,
+        "s3_table_based": s3_table_based,
+        "sql_warehouses": sql_warehouses,
+    }
+
+
+# --- Edit script actions ---
+# Each action interacts with a running AppTest the way an analyst would; the caller times the rerun.
+
+def add_jobs(at, step):
+    """
+    Adds five jobs to one tier through its 'Number of Jobs' input. Tiers already at the input's
+    maximum get the rows appended to session state instead, as an inventory import would.
+    """
+    tier = list(DBU_RATES.keys())[step % len(DBU_RATES)]
+    widget = at.number_input(key=f"num_jobs_{tier}")
+    if widget.value + 5 <= widget.proto.max:
+        widget.set_value(widget.value + 5)
+        return
+    dbx_jobs = dict(at.session_state["dbx_jobs"])
+    jobs = dbx_jobs[tier]
+    new_jobs = jobs.tail(5).copy()
+    new_jobs["Job Name"] = [f"Added Job {step}.{i + 1}" for i in range(len(new_jobs))]
+    jobs = pd.concat([jobs, new_jobs], ignore_index=True)
+    jobs["#"] = jobs.index + 1
+    dbx_jobs[tier] = jobs
+    at.session_state["dbx_jobs"] = dbx_jobs
+
+
+def toggle_spot(at, step):
+    """Flips Spot on every other job of one tier (the data editor cannot be driven by AppTest)."""
+    tier = list(DBU_RATES.keys())[step % len(DBU_RATES)]
+    dbx_jobs = dict(at.session_state["dbx_jobs"])
+    jobs = dbx_jobs[tier].copy()
+    jobs.loc[jobs.index[::2], "Spot"] = ~jobs["Spot"].iloc[::2].astype(bool)
+    dbx_jobs[tier] = jobs
+    at.session_state["dbx_jobs"] = dbx_jobs
+
+
+def change_s3_class(at, step):
+    """Moves one S3 zone to the next storage class."""
+    zone = S3_ZONES[step % len(S3_ZONES)]
+    widget = at.selectbox(key=f"s3_class_{zone}")
+    widget.set_value(S3_STORAGE_CLASSES[(S3_STORAGE_CLASSES.index(widget.value) + 1) % len(S3_STORAGE_CLASSES)])
+
+
+def add_warehouse(at, step):
+    """Clicks 'Add SQL Warehouse'."""
+    at.button(key="add_sql_warehouse_button_top").click()
+
+
+def rerun(at, step):
+    """A plain rerun with no change, e.g. switching tabs or a stale widget event."""
+
+
+ACTIONS = {
+    "add_jobs": add_jobs,
+    "toggle_spot": toggle_spot,
+    "change_s3_class": change_s3_class,
+    "add_warehouse": add_warehouse,
+    "rerun": rerun,
+}
+DEFAULT_SCRIPT = ["add_jobs", "toggle_spot", "change_s3_class", "add_warehouse", "rerun"]
+
+
+def session_state_bytes(at):
+    """Approximate memory held by one session: the pickled size of everything in its session state."""
+    total = 0
+    for _, value in at.session_state.items():
+        try:
+            total += len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            total += sys.getsizeof(value)
+    return total
+
+
+def _completed(at):
+    """True when the last rerun reached the end of main.py (a dead script thread leaves no exception element)."""
+    try:
+        at.button(key=COMPLETED_RUN_KEY)
+    except KeyError:
+        return False
+    return True
+
+
+def run_session(session_id, inventory, script, repeat=1, timeout=DEFAULT_TIMEOUT):
+    """
+    Runs one simulated session: the initial page load with the seeded inventory, then the edit
+    script `repeat` times. A rerun counts as an error when the app raised, did not render to the
+    end, or left out a widget the next action needed; the session carries on with its script.
+
+    Meant to run alone in its process. Returns (latency samples, session state bytes, CPU seconds,
+    peak RSS in MB).
+    """
+    cpu_start = time.process_time()
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    for key, value in inventory.items():
+        at.session_state[key] = value
+
+    samples = []
+
+    def timed_run(action, step, errors=0):
+        start = time.perf_counter()
+        try:
+            at.run()
+        except Exception:
+            errors += 1
+        samples.append({
+            "Session": session_id,
+            "Step": step,
+            "Action": action,
+            "Latency (ms)": (time.perf_counter() - start) * 1000,
+            "Errors": errors + int(bool(at.exception) or not _completed(at)),
+        })
+
+    timed_run("initial_load", 0)
+    step = 1
+    for _ in range(repeat):
+        for action in script:
+            try:
+                ACTIONS[action](at, step)
+                action_errors = 0
+            except (KeyError, IndexError, ValueError):
+                # The widget the action drives is missing from the last render
+                action_errors = 1
+            timed_run(action, step, action_errors)
+            step += 1
+    return samples, session_state_bytes(at), time.process_time() - cpu_start, _peak_rss_mb()
+
+
+def _quiet_streamlit():
+    """
+    AppTest runs without a server, so Streamlit warns about missing contexts and deprecations on every
+    rerun; the config option covers loggers created later, set_log_level the ones that already exist.
+    """
+    st_config.set_option("logger.level", "error")
+    set_log_level("error")
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MB, or NaN where the resource module is missing."""
+    if resource is None:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_load_test(num_sessions=10, workers=None, jobs_per_tier=50, tables_per_zone=5, num_warehouses=3,
+                  script=None, repeat=1, seed=0, timeout=DEFAULT_TIMEOUT):
+    """
+    Runs num_sessions sessions concurrently on `workers` processes (default: one per session).
+    Each session gets a fresh process, so its CPU time (including Streamlit's script threads) and
+    peak RSS are its own; st.cache_data is per process and therefore not shared between sessions.
+
+    Returns {"samples", "latency", "sessions", "summary"}.
+    """
+    script = script or DEFAULT_SCRIPT
+    unknown = [action for action in script if action not in ACTIONS]
+    if unknown:
+        raise ValueError(f"Unknown actions {unknown}; choose from {list(ACTIONS)}")
+
+    inventories = [build_inventory(jobs_per_tier, tables_per_zone, num_warehouses, seed + i) for i in range(num_sessions)]
+
+    wall_start = time.perf_counter()
+    # Spawned, single-use workers: no state (or Runtime singleton) leaks from one session to the next
+    with ProcessPoolExecutor(max_workers=workers or num_sessions, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_quiet_streamlit, max_tasks_per_child=1) as executor:
+        futures = [executor.submit(run_session, i, inventory, script, repeat, timeout) for i, inventory in enumerate(inventories)]
+        results = [future.result() for future in futures]
+    wall_seconds = time.perf_counter() - wall_start
+
+    samples = pd.DataFrame([sample for session_samples, _, _, _ in results for sample in session_samples])
+    sessions = pd.DataFrame({
+        "Session": range(num_sessions),
+        "Session State (KB)": [state_bytes / 1024 for _, state_bytes, _, _ in results],
+        "CPU Time (s)": [cpu_seconds for _, _, cpu_seconds, _ in results],
+        "Peak RSS (MB)": [peak_rss for _, _, _, peak_rss in results],
+        "Interactions": samples.groupby("Session").size().to_numpy(),
+        "Errors": samples.groupby("Session")["Errors"].sum().to_numpy(),
+    })
+    cpu_seconds = sessions["CPU Time (s)"].sum()
+
+    def latency_stats(latencies):
+        stats = {"Count": float(len(latencies)), "Mean (ms)": latencies.mean()}
+        stats.update({f"P{p} (ms)": np.percentile(latencies, p) for p in PERCENTILES})
+        stats["Max (ms)"] = latencies.max()
+        return pd.Series(stats)
+
+    latency = samples.groupby("Action", sort=False)["Latency (ms)"].apply(latency_stats).unstack()
+    latency.loc["All interactions"] = latency_stats(samples["Latency (ms)"])
+    latency["Count"] = latency["Count"].astype(int)
+
+    summary = {
+        "Sessions": num_sessions,
+        "Workers": workers or num_sessions,
+        "Interactions": len(samples),
+        "Errors": int(samples["Errors"].sum()),
+        "Wall Time (s)": wall_seconds,
+        "Throughput (interactions/s)": len(samples) / wall_seconds if wall_seconds else float("nan"),
+        "CPU Time (s)": cpu_seconds,
+        "CPU per Interaction (ms)": cpu_seconds / len(samples) * 1000 if len(samples) else float("nan"),
+        "CPU Utilization (cores)": cpu_seconds / wall_seconds if wall_seconds else float("nan"),
+        "Mean Session State (KB)": sessions["Session State (KB)"].mean(),
+        "Peak RSS per Session (MB)": sessions["Peak RSS (MB)"].max(),
+    }
+    return {"samples": samples, "latency": latency.reset_index(), "sessions": sessions, "summary": summary}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the cost calculator with concurrent simulated sessions.")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent sessions to simulate")
+    parser.add_argument("--workers", type=int, default=None, help="Processes running sessions (defaults to one per session)")
+    parser.add_argument("--jobs-per-tier", type=int, default=50, help="Seeded Databricks jobs per tier")
+    parser.add_argument("--tables-per-zone", type=int, default=5, help="Seeded S3 tables per zone")
+    parser.add_argument("--warehouses", type=int, default=3, help="Seeded SQL warehouses")
+    parser.add_argument("--script", default=",".join(DEFAULT_SCRIPT), help=f"Comma-separated actions from {list(ACTIONS)}")
+    parser.add_argument("--repeat", type=int, default=1, help="Times each session replays the script")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the first session's inventory")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Seconds before a single rerun is considered hung")
+    parser.add_argument("--output", help="Optional CSV file for the raw latency samples")
+    args = parser.parse_args()
+
+    _quiet_streamlit()
+
+    result = run_load_test(args.sessions, args.workers, args.jobs_per_tier, args.tables_per_zone, args.warehouses,
+                           [action.strip() for action in args.script.split(",") if action.strip()],
+                           args.repeat, args.seed, args.timeout)
+
+    print("Latency per interaction:")
+    print(result["latency"].to_string(index=False, float_format=lambda value: f"{value:,.1f}"))
+    print()
+    for label, value in result["summary"].items():
+        print(f"{label}: {value:,.2f}" if isinstance(value, float) else f"{label}: {value:,}")
+    if args.output:
+        result["samples"].to_csv(args.output, index=False)
+        print(f"Raw samples written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
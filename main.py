@@ -2,8 +2,10 @@
 import streamlit as st
 from streamlit_toggle import theme as st_toggle_theme
 from state import initialize_state
-from calculations import calculate_databricks_costs_for_tier, calculate_s3_cost_per_zone, calculate_sql_warehouse_cost
-from ui_components import render_summary_column, render_databricks_tab, render_s3_tab, render_sql_warehouse_tab, render_configuration_guide, render_export_button
+from calculations import calculate_databricks_costs_incremental, calculate_s3_cost_per_zone, calculate_sql_warehouse_cost
+from ui_components import render_summary_column, render_databricks_tab, render_s3_tab, render_sql_warehouse_tab, render_configuration_guide, render_export_button, render_cost_breakdown_tab, render_compare_tab, render_arrow_export_button, render_sensitivity_tab, render_commitments_tab, render_chargeback_tab, render_concurrency_tab, render_history_controls, render_price_notice, render_consolidation_tab
+from sensitivity import compute_sensitivity
+from price_watcher import get_price_watcher, sync_session_prices
 from data import DBU_RATES
 from file_exportor import generate_consolidated_excel_export 
 import io 
@@ -19,6 +21,9 @@ st.set_page_config(
 # This is the most important part. It MUST be called before any calculations.
 initialize_state()
 
+# Record edits made by the previous run (data editors and buttons that call st.rerun()) as an undo step
+st.session_state.estimate_history.capture(st.session_state)
+
 # This is for Databricks overall growth, not S3 per-zone growth
 if 'monthly_growth_percent' not in st.session_state:
     st.session_state.monthly_growth_percent = 0.0
@@ -29,9 +34,21 @@ if 'theme' not in st.session_state:
 
 # --- 2. Perform All Calculations ---
 # This block can now safely access session_state because it has been initialized.
+# Prices hot-reload from the price directory; pick up any change since this session's last run
+price_watcher = get_price_watcher()
+sync_session_prices(st.session_state, price_watcher)
+price_generation = price_watcher.generation
+
+# Priced tiers are cached per session and only the jobs whose prices changed are repriced
+if 'priced_tiers' not in st.session_state:
+    st.session_state.priced_tiers = {}
 calculated_dbx_data = {}
 for tier in DBU_RATES.keys():
-    df_with_costs, dbu_cost, ec2_cost = calculate_databricks_costs_for_tier(st.session_state.dbx_jobs[tier], tier)
+    cached = st.session_state.priced_tiers.get(tier)
+    changed_prices = price_watcher.changes_since(cached["generation"], price_generation) if cached else None
+    df_with_costs, dbu_cost, ec2_cost, st.session_state.priced_tiers[tier], _ = calculate_databricks_costs_incremental(
+        st.session_state.dbx_jobs[tier], tier, cached, changed_prices, price_generation
+    )
     calculated_dbx_data[tier] = {
         "df": df_with_costs,
         "dbu_cost": dbu_cost,
@@ -45,6 +62,18 @@ sql_cost = calculate_sql_warehouse_cost()
 databricks_total_cost = sum(data['dbu_cost'] + data['ec2_cost'] for data in calculated_dbx_data.values())
 total_cost = databricks_total_cost + s3_cost + sql_cost
 
+# Sensitivity of the 12-month projection to every cost driver (shown in its tab and exported)
+base_annual_cost, sensitivity_df = compute_sensitivity(
+    calculated_dbx_data,
+    st.session_state.s3_calc_method,
+    st.session_state.s3_direct,
+    s3_costs_per_zone,
+    sql_cost,
+    st.session_state.monthly_growth_percent,
+    st.session_state.sensitivity_percent,
+    st.session_state.sensitivity_s3_growth_points
+)
+
 # --- 3. Render Main Layout ---
 title_col, controls_col = st.columns([4, 1])
 
@@ -63,7 +92,16 @@ with controls_col:
             st.session_state.s3_calc_method,
             st.session_state.s3_direct,
             st.session_state.s3_table_based,
-            st.session_state.sql_warehouses
+            st.session_state.sql_warehouses,
+            sensitivity_df
+        )
+        render_arrow_export_button(
+            calculated_dbx_data,
+            st.session_state.s3_calc_method,
+            st.session_state.s3_direct,
+            st.session_state.s3_table_based,
+            st.session_state.sql_warehouses,
+            s3_costs_per_zone
         )
     with theme_col:
         # Custom theme toggle using a button
@@ -80,13 +118,18 @@ with controls_col:
             st.config.set_option("theme.base", new_theme)
             st.rerun() # Rerun to apply the theme change immediately
 
+    # Filled in at the end of the run, once this run's edits have been recorded
+    history_controls = st.container()
+
 # Apply the current theme setting
 st.config.set_option("theme.base", st.session_state.theme)
 
+render_price_notice(price_watcher)
+
 main_col, summary_col = st.columns([3, 1])
 
 with main_col:
-    tab1, tab2, tab3 = st.tabs(["Databricks & Compute", "S3 Storage", "SQL Warehouse"])
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8, tab9, tab10 = st.tabs(["Databricks & Compute", "S3 Storage", "SQL Warehouse", "Cost Breakdown", "Compare", "Sensitivity", "Commitments", "Chargeback", "Concurrency", "Consolidation"])
 
     with tab1:
         render_databricks_tab(calculated_dbx_data)
@@ -96,7 +139,26 @@ with main_col:
         render_s3_tab(s3_costs_per_zone, s3_cost, projected_s3_cost_12_months)
     with tab3:
         render_sql_warehouse_tab(sql_cost)
+    with tab4:
+        render_cost_breakdown_tab(calculated_dbx_data)
+    with tab5:
+        render_compare_tab(calculated_dbx_data, s3_costs_per_zone)
+    with tab6:
+        render_sensitivity_tab(base_annual_cost, sensitivity_df)
+    with tab7:
+        render_commitments_tab(calculated_dbx_data, sql_cost)
+    with tab8:
+        render_chargeback_tab(calculated_dbx_data, s3_costs_per_zone)
+    with tab9:
+        render_concurrency_tab(calculated_dbx_data)
+    with tab10:
+        render_consolidation_tab(calculated_dbx_data, s3_costs_per_zone)
 
 with summary_col:
     # Pass the projected_s3_cost_12_months to render_summary_column
     render_summary_column(total_cost, databricks_total_cost, s3_cost, sql_cost, projected_s3_cost_12_months)
+
+# Widgets write their values into the estimate while rendering; record those as an undo step too
+st.session_state.estimate_history.capture(st.session_state)
+with history_controls:
+    render_history_controls()
@@ -0,0 +1,295 @@
+# price_watcher.py
+# Hot reload of list prices from a local price directory, without restarting the server.
+#
+# The directory (PRICE_DIR, default ./prices) may hold any of the files below, each shaped like
+# the matching table in data.py; SKUs a file leaves out keep their current price:
+#   instance_prices.json        {"General Purpose": {"m5.large": 0.096, ...}, ...}
+#   dbu_rates.json              {"L0 / Bronze": 0.15, ...}
+#   s3_pricing.json             {"Standard": {"storage_gb": 0.023, ...}, ...}
+#   sql_warehouse_pricing.json  {"Small": {"dbt_per_hr": 4, "cost_per_hr": 0.88}, ...}
+# and optionally a VERSION file whose first line becomes PRICING_VERSION.
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import data
+from data import (INSTANCE_PRICES, FLAT_INSTANCE_LIST, INSTANCE_LIST, INSTANCE_FAMILY_LOOKUP, DBU_RATES,
+                  S3_PRICING, S3_STORAGE_CLASSES, SQL_WAREHOUSE_PRICING, SQL_WAREHOUSE_SIZES)
+
+PRICE_DIR = os.environ.get("PRICE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "prices"))
+POLL_SECONDS = float(os.environ.get("PRICE_POLL_SECONDS", "5"))
+VERSION_FILE = "VERSION"
+# Generations kept in the change log; sessions further behind than this reprice in full
+CHANGELOG_LENGTH = 100
+# Sessions that have not rerun for this long are dropped from the live-estimate registry
+SESSION_TTL_SECONDS = 3600
+
+BASE_PRICING_VERSION = data.PRICING_VERSION
+
+logger = logging.getLogger(__name__)
+
+
+def _validate_price(value, where):
+    # json.load accepts NaN and Infinity, which would reprice every live estimate to NaN
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value < 0:
+        raise ValueError(f"{where}: expected a finite, non-negative number, got {value!r}")
+    return value
+
+
+def sql_size_label(size):
+    """The selectbox label for a warehouse size, e.g. 'Small - 4 DBUs - $0.88/hr'."""
+    pricing = SQL_WAREHOUSE_PRICING[size]
+    return f"{size} - {pricing['dbt_per_hr']} DBUs - ${pricing['cost_per_hr']}/hr"
+
+
+# --- Table loaders ---
+# Each one diffs a parsed price file against the live table and returns (changed price keys, apply).
+# apply() swaps the new prices in with single dict.update / slice assignments, each of which runs
+# under the GIL without calling back into Python, so no rerun ever sees a half-updated table.
+
+def _load_instance_prices(table):
+    changed, prices, families = set(), {}, {}
+    for family, instances in table.items():
+        for instance, price in instances.items():
+            label = f"{instance} ({family})"
+            price = _validate_price(price, f"instance_prices.json {label}")
+            if FLAT_INSTANCE_LIST.get(label) != price:
+                changed.add(("instance", label))
+                prices[label] = price
+                families.setdefault(family, {})[instance] = price
+
+    def apply():
+        FLAT_INSTANCE_LIST.update(prices)
+        INSTANCE_FAMILY_LOOKUP.update({label: label[label.index("(") + 1:-1] for label in prices})
+        new_labels = [label for label in prices if label not in INSTANCE_LIST]
+        if new_labels:
+            INSTANCE_LIST.extend(new_labels)
+        for family, instances in families.items():
+            INSTANCE_PRICES.setdefault(family, {}).update(instances)
+    return changed, apply
+
+
+def _load_dbu_rates(table):
+    unknown = [tier for tier in table if tier not in DBU_RATES]
+    if unknown:
+        raise ValueError(f"dbu_rates.json: unknown tiers {unknown}; tiers cannot be added at runtime")
+    rates = {tier: _validate_price(rate, f"dbu_rates.json {tier}") for tier, rate in table.items() if DBU_RATES[tier] != rate}
+
+    def apply():
+        DBU_RATES.update(rates)
+    return {("dbu", tier) for tier in rates}, apply
+
+
+def _load_s3_pricing(table):
+    classes = {}
+    for storage_class, pricing in table.items():
+        merged = {**S3_PRICING.get(storage_class, {"storage_gb": 0, "put_1k": 0, "get_1k": 0}), **pricing}
+        for field, price in merged.items():
+            _validate_price(price, f"s3_pricing.json {storage_class}.{field}")
+        if S3_PRICING.get(storage_class) != merged:
+            classes[storage_class] = merged
+
+    def apply():
+        S3_PRICING.update(classes)
+        new_classes = [storage_class for storage_class in classes if storage_class not in S3_STORAGE_CLASSES]
+        if new_classes:
+            S3_STORAGE_CLASSES.extend(new_classes)
+    return {("s3", storage_class) for storage_class in classes}, apply
+
+
+def _load_sql_warehouse_pricing(table):
+    sizes = {}
+    for size, pricing in table.items():
+        merged = {**SQL_WAREHOUSE_PRICING.get(size, {"dbt_per_hr": 0, "cost_per_hr": 0}), **pricing}
+        for field, price in merged.items():
+            _validate_price(price, f"sql_warehouse_pricing.json {size}.{field}")
+        if SQL_WAREHOUSE_PRICING.get(size) != merged:
+            sizes[size] = merged
+
+    def apply():
+        SQL_WAREHOUSE_PRICING.update(sizes)
+        # The size labels embed the price, so the whole list is rebuilt and swapped in one assignment
+        SQL_WAREHOUSE_SIZES[:] = [sql_size_label(size) for size in SQL_WAREHOUSE_PRICING]
+    return {("sql", size) for size in sizes}, apply
+
+
+PRICE_FILES = {
+    "instance_prices.json": _load_instance_prices,
+    "dbu_rates.json": _load_dbu_rates,
+    "s3_pricing.json": _load_s3_pricing,
+    "sql_warehouse_pricing.json": _load_sql_warehouse_pricing,
+}
+
+
+class PriceWatcher:
+    """
+    Polls the price directory and applies changed tables to data.py in place, so every module that
+    imported them sees the new prices on its next rerun. Each applied change bumps `generation` and
+    is logged with the set of price keys it touched: ("instance", label), ("dbu", tier),
+    ("s3", storage class) or ("sql", size). Sessions use the log to reprice only what changed.
+    """
+
+    def __init__(self, directory=PRICE_DIR, poll_seconds=POLL_SECONDS):
+        self.directory = directory
+        self.poll_seconds = poll_seconds
+        self.generation = 0
+        self.changes = deque(maxlen=CHANGELOG_LENGTH)
+        self.errors = {}
+        self.sessions = {}
+        self._signatures = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Starts the background polling thread (once)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="price-watcher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception:
+                # One bad poll must not stop hot reload for the rest of the process
+                logger.exception("Price reload failed; retrying in %s seconds", self.poll_seconds)
+            time.sleep(self.poll_seconds)
+
+    def _file_signature(self, name):
+        try:
+            stat = os.stat(os.path.join(self.directory, name))
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self):
+        """Checks every price file once and applies the ones that changed. Returns the new change log entry, if any."""
+        with self._lock:
+            changed_keys, appliers = set(), []
+            for name, loader in PRICE_FILES.items():
+                signature = self._file_signature(name)
+                if signature is None or signature == self._signatures.get(name):
+                    continue
+                self._signatures[name] = signature
+                try:
+                    with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                        keys, apply = loader(json.load(f))
+                except (OSError, ValueError, TypeError, AttributeError) as e:
+                    # Keep serving the last good prices; the file is retried once it changes again
+                    self.errors[name] = str(e)
+                    continue
+                self.errors.pop(name, None)
+                changed_keys |= keys
+                appliers.append(apply)
+
+            if not changed_keys:
+                return None
+            for apply in appliers:
+                apply()
+            data.PRICING_VERSION = self._read_version()
+
+            now = time.time()
+            # register_session also takes the lock, so the registry cannot change while it is filtered
+            self.sessions = {sid: info for sid, info in self.sessions.copy().items() if now - info["seen"] < SESSION_TTL_SECONDS}
+            entry = {
+                "generation": self.generation + 1,
+                "pricing_version": data.PRICING_VERSION,
+                "applied_at": now,
+                "keys": frozenset(changed_keys),
+                "affected_sessions": frozenset(sid for sid, info in self.sessions.items() if info["keys"] & changed_keys),
+                "live_sessions": len(self.sessions),
+            }
+            self.changes.append(entry)
+            # Bumped last: a rerun that reads the new generation is guaranteed to see the new prices
+            self.generation = entry["generation"]
+            return entry
+
+    def _read_version(self):
+        try:
+            with open(os.path.join(self.directory, VERSION_FILE), encoding="utf-8") as f:
+                version = f.readline().strip()
+        except OSError:
+            version = ""
+        return version or f"{BASE_PRICING_VERSION}+reload{self.generation + 1}"
+
+    def changes_since(self, since, until=None):
+        """
+        Union of the price keys changed after generation `since` up to `until` (default: now), or
+        None when the log no longer reaches back that far and the caller must reprice everything.
+        """
+        until = self.generation if until is None else until
+        if since >= until:
+            return frozenset()
+        entries = [entry for entry in list(self.changes) if since < entry["generation"] <= until]
+        if len(entries) < until - since:
+            return None
+        return frozenset().union(*(entry["keys"] for entry in entries))
+
+    def entries_since(self, since):
+        return [entry for entry in list(self.changes) if entry["generation"] > since]
+
+    def register_session(self, session_id, keys):
+        """Records which price keys a live estimate depends on, so a reload can report the estimates it affects."""
+        with self._lock:
+            self.sessions[session_id] = {"keys": frozenset(keys), "seen": time.time()}
+
+
+@st.cache_resource
+def get_price_watcher():
+    """The process-wide PriceWatcher, shared by every session and polling in the background."""
+    watcher = PriceWatcher()
+    watcher.poll()
+    watcher.start()
+    return watcher
+
+
+def used_price_keys(dbx_jobs, s3_calc_method, s3_direct_config, sql_warehouses_config):
+    """The price keys an estimate depends on."""
+    keys = set()
+    for tier, jobs_df in dbx_jobs.items():
+        if not jobs_df.empty:
+            keys.add(("dbu", tier))
+            keys.update(("instance", instance) for instance in jobs_df["Instance Type"].unique())
+    if s3_calc_method == "Direct Storage":
+        keys.update(("s3", config["class"]) for config in s3_direct_config.values())
+    else:
+        keys.add(("s3", "Standard"))
+    keys.update(("sql", warehouse["size"].split(" - ")[0]) for warehouse in sql_warehouses_config)
+    return keys
+
+
+def sync_session_prices(state, watcher):
+    """
+    Brings one session up to the watcher's price generation: warehouse size labels (which embed the
+    price) are rewritten to the current ones, and the price changes the session has not seen yet are
+    stored in state['price_notice'] for display. Also registers the session as a live estimate.
+    """
+    for i, warehouse in enumerate(state["sql_warehouses"]):
+        size = warehouse["size"].split(" - ")[0]
+        if size in SQL_WAREHOUSE_PRICING and warehouse["size"] != sql_size_label(size):
+            warehouse["size"] = sql_size_label(size)
+            # The selectbox would otherwise keep the stale label, which is no longer an option
+            if f"sql_size_{i}" in state:
+                del state[f"sql_size_{i}"]
+
+    seen = state.get("price_generation")
+    if seen is not None and seen < watcher.generation:
+        entries = watcher.entries_since(seen)
+        state["price_notice"] = {
+            "pricing_version": entries[-1]["pricing_version"] if entries else data.PRICING_VERSION,
+            "keys": frozenset().union(*(entry["keys"] for entry in entries)),
+            "affected_sessions": len(frozenset().union(*(entry["affected_sessions"] for entry in entries))),
+            "live_sessions": max((entry["live_sessions"] for entry in entries), default=0),
+        }
+    state["price_generation"] = watcher.generation
+
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        watcher.register_session(ctx.session_id, used_price_keys(
+            state["dbx_jobs"], state["s3_calc_method"], state["s3_direct"], state["sql_warehouses"]
+        ))
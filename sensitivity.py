@@ -0,0 +1,105 @@
+# sensitivity.py
+import numpy as np
+import pandas as pd
+from data import PHOTON_PREMIUM_MULTIPLIER, SPOT_DISCOUNT_MULTIPLIER
+from calculations import combine_calculated_jobs
+
+DEFAULT_PERTURBATION_PERCENT = 10.0
+DEFAULT_S3_GROWTH_POINTS = 1.0
+DEFAULT_TOP_JOBS = 10
+PROJECTION_MONTHS = 12
+
+SENSITIVITY_COLUMNS = ["Driver", "Perturbation", "Low Impact ($)", "High Impact ($)", "Swing ($)", "Method"]
+
+
+def annuity_factor(growth_percent, months=PROJECTION_MONTHS):
+    """
+    Sum of monthly cost multipliers over the horizon for compound monthly growth,
+    i.e. ((1+g)^months - 1) / g, falling back to months when growth is zero. Vectorized.
+    """
+    g = np.asarray(growth_percent, dtype=float) / 100
+    safe_g = np.where(g > 0, g, 1.0)
+    return np.where(g > 0, ((1 + safe_g) ** months - 1) / safe_g, float(months))
+
+
+def compute_sensitivity(calculated_dbx_data, s3_calc_method, s3_direct_config, s3_costs_per_zone, sql_cost,
+                        dbx_growth_percent=0.0, perturbation_percent=DEFAULT_PERTURBATION_PERCENT,
+                        s3_growth_points=DEFAULT_S3_GROWTH_POINTS, top_jobs=DEFAULT_TOP_JOBS):
+    """
+    Computes the 12-month projected cost impact of perturbing every cost driver down and up.
+
+    Databricks, Photon, Spot, DBU rate and warehouse-hour drivers are linear in the cost, so their
+    impact is the analytic derivative (taken from the already calculated costs) times the perturbation,
+    evaluated for all drivers in one broadcast. S3 growth compounds, so it is evaluated exactly,
+    with all zones and both perturbations in a single array operation.
+
+    Returns (base 12-month cost, DataFrame of drivers sorted by swing).
+    """
+    jobs = combine_calculated_jobs(calculated_dbx_data)
+    dbx_annuity = float(annuity_factor(dbx_growth_percent))
+    x = perturbation_percent / 100
+
+    dbx_monthly = jobs['Total Cost'].sum()
+    photon_mask = jobs['Photon'].astype(bool).to_numpy()
+    spot_mask = jobs['Spot'].astype(bool).to_numpy()
+    photon_dbu_cost = jobs['DBU Cost'].to_numpy(dtype=float)[photon_mask].sum()
+    # EC2 cost of Spot jobs at list price, i.e. d(cost)/d(spot multiplier)
+    spot_list_ec2_cost = jobs['EC2 Cost'].to_numpy(dtype=float)[spot_mask].sum() / SPOT_DISCOUNT_MULTIPLIER
+    spot_discount = 1 - SPOT_DISCOUNT_MULTIPLIER
+
+    # (label, perturbation label, d(annual cost) per unit of relative change)
+    linear_drivers = [
+        ("Runtime (hrs), all jobs", f"±{perturbation_percent:g}%", dbx_monthly * dbx_annuity),
+        ("Runs/Month, all jobs", f"±{perturbation_percent:g}%", dbx_monthly * dbx_annuity),
+        ("Nodes, all jobs", f"±{perturbation_percent:g}%", dbx_monthly * dbx_annuity),
+        (f"Photon premium (×{PHOTON_PREMIUM_MULTIPLIER:g})", f"±{perturbation_percent:g}%", photon_dbu_cost * dbx_annuity),
+        # A larger discount lowers the cost, hence the negative sign
+        (f"Spot discount ({spot_discount:.0%})", f"±{perturbation_percent:g}%", -spot_discount * spot_list_ec2_cost * dbx_annuity),
+        ("SQL warehouse hours/day", f"±{perturbation_percent:g}%", sql_cost * PROJECTION_MONTHS),
+    ]
+    tier_dbu_costs = jobs.groupby('Tier')['DBU Cost'].sum()
+    for tier in calculated_dbx_data.keys():
+        linear_drivers.append((f"DBU rate, {tier}", f"±{perturbation_percent:g}%", tier_dbu_costs.get(tier, 0.0) * dbx_annuity))
+
+    # Per-job runtime: every job's derivative comes from one vectorized pass; only the largest are shown
+    if not jobs.empty:
+        top = jobs.nlargest(top_jobs, 'Total Cost')
+        for tier, name, job_cost in zip(top['Tier'], top['Job Name'], top['Total Cost']):
+            linear_drivers.append((f"Runtime, {tier} · {name}", f"±{perturbation_percent:g}%", job_cost * dbx_annuity))
+
+    elasticities = np.array([driver[2] for driver in linear_drivers], dtype=float)
+    perturbations = np.array([-x, x])
+    impacts = elasticities[:, None] * perturbations[None, :]
+
+    rows = [{
+        "Driver": label,
+        "Perturbation": perturbation_label,
+        "Low Impact ($)": low,
+        "High Impact ($)": high,
+        "Method": "Analytic derivative",
+    } for (label, perturbation_label, _), (low, high) in zip(linear_drivers, impacts)]
+
+    # S3 storage projection
+    zone_costs = np.array([s3_costs_per_zone.get(zone, 0.0) for zone in s3_costs_per_zone], dtype=float)
+    if s3_calc_method == "Direct Storage":
+        growth = np.array([s3_direct_config[zone].get("monthly_growth_percent", 0.0) for zone in s3_costs_per_zone], dtype=float)
+        base_s3 = (zone_costs * annuity_factor(growth)).sum()
+
+        shifted_growth = np.clip(growth[None, :] + np.array([-s3_growth_points, s3_growth_points])[:, None], 0.0, None)
+        s3_low, s3_high = (zone_costs[None, :] * annuity_factor(shifted_growth)).sum(axis=1) - base_s3
+        rows.append({
+            "Driver": "S3 monthly growth, all zones",
+            "Perturbation": f"±{s3_growth_points:g} pp",
+            "Low Impact ($)": s3_low,
+            "High Impact ($)": s3_high,
+            "Method": "Batched evaluation",
+        })
+    else:
+        base_s3 = zone_costs.sum() * PROJECTION_MONTHS
+
+    base_annual_cost = dbx_monthly * dbx_annuity + sql_cost * PROJECTION_MONTHS + base_s3
+
+    result = pd.DataFrame(rows, columns=[c for c in SENSITIVITY_COLUMNS if c != "Swing ($)"])
+    result["Swing ($)"] = (result["High Impact ($)"] - result["Low Impact ($)"]).abs()
+    result = result[SENSITIVITY_COLUMNS].sort_values("Swing ($)", ascending=False, kind="stable").reset_index(drop=True)
+    return base_annual_cost, result
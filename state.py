@@ -1,7 +1,8 @@
 # state.py
 import streamlit as st
 import pandas as pd
-from data import INSTANCE_LIST, SQL_WAREHOUSE_SIZES, S3_STORAGE_CLASSES, DBU_RATES, SQL_WAREHOUSE_TYPES
+from history import EstimateHistory
+from data import INSTANCE_LIST, SQL_WAREHOUSE_SIZES, S3_STORAGE_CLASSES, DBU_RATES, SQL_WAREHOUSE_TYPES, TAG_FIELDS
 
 def initialize_state():
     """Initializes session state variables if they don't exist."""
@@ -13,10 +14,17 @@ def initialize_state():
         st.session_state.dbx_jobs = {
             tier: pd.DataFrame([{
                 "#": 1, "Job Name": f"{tier.split(' / ')[1]} Job 1", "Runtime (hrs)": 0, "Runs/Month": 0,
-                "Instance Type": INSTANCE_LIST[0], "Nodes": 1, "Photon": False, "Spot": False
+                "Instance Type": INSTANCE_LIST[0], "Nodes": 1, "Photon": False, "Spot": False, "Schedule": "",
+                **{tag: "" for tag in TAG_FIELDS}
             }]) for tier in DBU_RATES.keys()
         }
 
+    # Ensure existing job tables have the optional 'Schedule' and chargeback tag columns
+    for tier, jobs_df in st.session_state.dbx_jobs.items():
+        missing_columns = [column for column in ["Schedule"] + TAG_FIELDS if column not in jobs_df.columns]
+        if missing_columns:
+            st.session_state.dbx_jobs[tier] = jobs_df.assign(**{column: "" for column in missing_columns})
+
     # S3 state
     if 's3_calc_method' not in st.session_state:
         st.session_state.s3_calc_method = "Direct Storage"
@@ -62,22 +70,48 @@ def initialize_state():
                     if 'Columns' not in table_config:
                         st.session_state.s3_table_based[zone_name][i]['Columns'] = 10 # Default new column count
 
+    # Chargeback tags per S3 zone (tables without their own tags inherit these)
+    if 's3_zone_tags' not in st.session_state:
+        st.session_state.s3_zone_tags = {}
+    for zone in list(st.session_state.s3_direct.keys()) + list(st.session_state.s3_table_based.keys()):
+        zone_tags = st.session_state.s3_zone_tags.setdefault(zone, {})
+        for tag in TAG_FIELDS:
+            zone_tags.setdefault(tag, "")
+
     # SQL Warehouse state
     if 'sql_warehouses' not in st.session_state:
         st.session_state.sql_warehouses = [{
             "id": "warehouse_0", "name": "Primary BI Warehouse", "type": SQL_WAREHOUSE_TYPES[0], "size": SQL_WAREHOUSE_SIZES[0], # Default to 2X-Small
-            "hours_per_day": 8, "days_per_month": 22, "auto_suspend": True, "suspend_after": 10
+            "hours_per_day": 8, "days_per_month": 22, "auto_suspend": True, "suspend_after": 10,
+            "tags": {tag: "" for tag in TAG_FIELDS}
         }]
     
-    # Ensure existing SQL warehouses have 'type'
+    # Ensure existing SQL warehouses have 'type' and chargeback tags
     for warehouse in st.session_state.sql_warehouses:
         if 'type' not in warehouse:
             warehouse['type'] = SQL_WAREHOUSE_TYPES[0]
+        warehouse_tags = warehouse.setdefault('tags', {})
+        for tag in TAG_FIELDS:
+            warehouse_tags.setdefault(tag, "")
 
     # Monthly Growth Rate for Databricks (used in overall projection, but no longer an input in summary)
     if 'monthly_growth_percent' not in st.session_state:
         st.session_state.monthly_growth_percent = 0.0
 
+    # Saved estimates used as baselines in the Compare tab
+    if 'saved_estimates' not in st.session_state:
+        st.session_state.saved_estimates = {}
+
+    # Sensitivity analysis perturbation sizes
+    if 'sensitivity_percent' not in st.session_state:
+        st.session_state.sensitivity_percent = 10.0
+    if 'sensitivity_s3_growth_points' not in st.session_state:
+        st.session_state.sensitivity_s3_growth_points = 1.0
+
+    # Undo/redo history of the estimate inputs
+    if 'estimate_history' not in st.session_state:
+        st.session_state.estimate_history = EstimateHistory()
+
     # Theme state
     if 'theme' not in st.session_state:
         st.session_state.theme = 'light'
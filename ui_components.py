@@ -2,8 +2,23 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-from data import DBU_RATES, INSTANCE_LIST, S3_STORAGE_CLASSES, SQL_WAREHOUSE_SIZES, SQL_WAREHOUSE_PRICING, SQL_WAREHOUSE_TYPES
-from file_exportor import generate_consolidated_excel_export
+from data import DBU_RATES, INSTANCE_LIST, S3_STORAGE_CLASSES, SQL_WAREHOUSE_SIZES, SQL_WAREHOUSE_PRICING, SQL_WAREHOUSE_TYPES, TAG_FIELDS
+from file_exportor import generate_consolidated_excel_export, generate_chargeback_excel_export_cached, generate_consolidation_excel_export_cached
+from chargeback import build_cost_items, get_chargeback_index, GROUP_DIMENSIONS
+from calculations import combine_calculated_jobs, calculate_sql_warehouse_cost_per_warehouse
+from estimate_diff import build_estimate, load_estimate_from_excel, load_estimate_from_bundle, diff_estimates
+from arrow_interchange import build_estimate_tables, generate_estimate_bundle
+from commitments import evaluate_commitments, DEFAULT_COMMIT_LEVELS
+from concurrency import fingerprint_schedule_inputs, simulate_concurrency_cached, PEAK_PERCENTILE
+from consolidation import fingerprint_plan_inputs, plan_consolidation_cached, DEFAULT_MAX_CLUSTER_WORKERS, DEFAULT_STARTUP_MINUTES, DEFAULT_IDLE_MINUTES
+from cost_breakdown import fingerprint_jobs, build_pareto_figure, build_treemap_figure, build_family_figure, build_histogram_figure, DEFAULT_TOP_N
+
+
+def render_tag_inputs(tags, key_prefix):
+    """Renders one text input per chargeback tag and writes the values back into the tags dict."""
+    cols = st.columns(len(TAG_FIELDS))
+    for col, tag in zip(cols, TAG_FIELDS):
+        tags[tag] = col.text_input(tag, value=tags.get(tag, ""), key=f"{key_prefix}_{tag}")
 
 
 def render_summary_column(total_cost, databricks_cost, s3_cost, sql_cost, projected_s3_cost_12_months):
@@ -111,7 +126,7 @@ def render_databricks_tab(calculated_dbx_data):
             c1.markdown(f"### {tier} <span style='background-color:#E8E8E8; border-radius:5px; padding: 2px 8px; font-size:90%; font-weight:bold; color:black;'>${tier_total_cost:,.2f}</span>", unsafe_allow_html=True)
             
             c2.write(f"{tier}")
-            num_jobs = c2.number_input("Number of Jobs", min_value=0, max_value=20, value=len(df_state), key=f"num_jobs_{tier}", label_visibility="collapsed")
+            num_jobs = c2.number_input("Number of Jobs", min_value=0, max_value=max(20, len(df_state)), value=len(df_state), key=f"num_jobs_{tier}", label_visibility="collapsed")
 
             # --- THIS IS THE FIX ---
             # This logic robustly handles adding or removing rows and prevents errors.
@@ -122,7 +137,8 @@ def render_databricks_tab(calculated_dbx_data):
                     new_rows_count = num_jobs - current_len
                     new_rows = pd.DataFrame([{
                         "Job Name": "New Job", "Runtime (hrs)": 0, "Runs/Month": 0,
-                        "Instance Type": INSTANCE_LIST[0], "Nodes": 1, "Photon": False, "Spot": False
+                        "Instance Type": INSTANCE_LIST[0], "Nodes": 1, "Photon": False, "Spot": False, "Schedule": "",
+                        **{tag: "" for tag in TAG_FIELDS}
                     }] * new_rows_count)
                     updated_df = pd.concat([df_state, new_rows], ignore_index=True)
                 else: # num_jobs < current_len
@@ -137,14 +153,15 @@ def render_databricks_tab(calculated_dbx_data):
 
             if not df_state.empty:
                 display_df = data['df']
-                editable_cols = ["Job Name", "Runtime (hrs)", "Runs/Month", "Instance Type", "Nodes", "Photon", "Spot"]
+                editable_cols = ["Job Name", "Runtime (hrs)", "Runs/Month", "Instance Type", "Nodes", "Photon", "Spot", "Schedule"] + TAG_FIELDS
                 
                 edited_df = st.data_editor(
                     display_df,
-                    column_order=["Job Name", "#", "Runtime (hrs)", "Runs/Month", "Instance Type", "Nodes", "Photon", "Spot", "DBU Units", "EC2 Cost", "DBU Cost" ],
+                    column_order=["Job Name", "#", "Runtime (hrs)", "Runs/Month", "Instance Type", "Nodes", "Photon", "Spot", "DBU Units", "EC2 Cost", "DBU Cost", "Schedule" ] + TAG_FIELDS,
                     column_config={
                         "#": st.column_config.NumberColumn("Job.no", disabled=True, width="small"),
                         "Instance Type": st.column_config.SelectboxColumn("Instance Type", options=INSTANCE_LIST, required=True),
+                        "Schedule": st.column_config.TextColumn("Schedule", help="Optional cron expression, e.g. '0 2 * * *'. Used by the Concurrency tab."),
                        # "DBU Rate": st.column_config.NumberColumn("DBU Rate", format="$%.4f", disabled=True),
                         #"Cost": st.column_config.TextColumn("Cost", disabled=True),
                         "DBU Units": st.column_config.NumberColumn("DBU", format="%.2f", disabled=True),
@@ -189,6 +206,7 @@ def render_s3_tab(s3_costs_per_zone, total_s3_cost, projected_s3_cost_12_months)
                     key=f"s3_growth_{zone}",
                     help=f"Anticipated monthly percentage increase in storage for {zone}."
                 )
+                render_tag_inputs(st.session_state.s3_zone_tags[zone], f"s3_tag_{zone}")
 
                 # c4, c5, _ = st.columns(3)
                 # config["put"] = c4.number_input("PUTs (x1000)", min_value=0, key=f"s3_put_{zone}", value=config["put"])
@@ -200,6 +218,8 @@ def render_s3_tab(s3_costs_per_zone, total_s3_cost, projected_s3_cost_12_months)
         for zone_name, zone_config in st.session_state.s3_table_based.items():
             with st.container(border=True):
                 st.subheader(zone_name)
+                st.caption("Zone tags apply to tables whose own tag cells are left blank.")
+                render_tag_inputs(st.session_state.s3_zone_tags[zone_name], f"s3_tag_{zone_name}")
 
                 # Ensure current_zone_tables_data is always a list of dicts
                 if not isinstance(st.session_state.s3_table_based[zone_name], list):
@@ -219,12 +239,14 @@ def render_s3_tab(s3_costs_per_zone, total_s3_cost, projected_s3_cost_12_months)
                     normalized_row["Records"] = float(normalized_row.get("Records") or 0)
                     normalized_row["Columns"] = float(normalized_row.get("Columns") or 0)
                     normalized_row["Table Name"] = normalized_row.get("Table Name") or ""
+                    for tag in TAG_FIELDS:
+                        normalized_row[tag] = normalized_row.get(tag) or ""
                     normalized_current_data.append(normalized_row)
                 
                 df_zone_initial = pd.DataFrame(normalized_current_data)
                 
                 if df_zone_initial.empty:
-                    df_zone_initial = pd.DataFrame(columns=["Table Name", "Records", "Columns"])
+                    df_zone_initial = pd.DataFrame(columns=["Table Name", "Records", "Columns"] + TAG_FIELDS)
                 
                 # IMPORTANT: Remove 'id' column before passing to data_editor if it's not a user-editable column
                 # The data editor can sometimes re-introduce it if it's in the initial df.
@@ -242,6 +264,7 @@ def render_s3_tab(s3_costs_per_zone, total_s3_cost, projected_s3_cost_12_months)
                         "Avg Rec Size (KB)": None,
                         "Avg Rec Size (MB)": None,
                         "Columns": st.column_config.NumberColumn("Columns", min_value=0, format="%d"),
+                        **{tag: st.column_config.TextColumn(tag) for tag in TAG_FIELDS},
                     },
                     hide_index=True,
                     num_rows="dynamic",
@@ -269,6 +292,12 @@ def render_s3_tab(s3_costs_per_zone, total_s3_cost, projected_s3_cost_12_months)
                 else:
                     edited_df_zone_processed["Table Name"] = ""
 
+                for tag in TAG_FIELDS:
+                    if tag in edited_df_zone_processed.columns:
+                        edited_df_zone_processed[tag] = edited_df_zone_processed[tag].apply(lambda x: x or "")
+                    else:
+                        edited_df_zone_processed[tag] = ""
+
                 # Filter out rows that are effectively empty (all primary keys blank)
                 # It's important to do this AFTER sanitization
                 original_row_count = len(edited_df_zone_processed)
@@ -290,7 +319,7 @@ def render_s3_tab(s3_costs_per_zone, total_s3_cost, projected_s3_cost_12_months)
 
                 # Convert to a consistent dictionary format for comparison and storage
                 # Ensure the column order for comparison
-                cols_for_comparison = ["Table Name", "Records", "Columns"]
+                cols_for_comparison = ["Table Name", "Records", "Columns"] + TAG_FIELDS
                 
 
                 # Re-create df_zone_initial but with normalized values and only relevant columns for comparison
@@ -332,7 +361,8 @@ def render_sql_warehouse_tab(total_sql_cost):
                 "hours_per_day": 8,
                 "days_per_month": 22,
                 "auto_suspend": True,
-                "suspend_after": 10
+                "suspend_after": 10,
+                "tags": {tag: "" for tag in TAG_FIELDS}
             })
             st.rerun() # Rerun immediately after state change
 
@@ -382,6 +412,7 @@ def render_sql_warehouse_tab(total_sql_cost):
                 warehouse["hours_per_day"] = st.number_input("Hours per Day", min_value=0, max_value=24, value=warehouse["hours_per_day"], key=f"sql_hours_{i}")
             with c5:
                 warehouse["days_per_month"] = st.number_input("Days per Month", min_value=0, max_value=31, value=warehouse["days_per_month"], key=f"sql_days_{i}")
+            render_tag_inputs(warehouse.setdefault("tags", {}), f"sql_tag_{i}")
             # st.markdown("**Auto-Suspend Configuration**")
             # warehouse["auto_suspend"] = st.checkbox("Enable Auto-Suspend", value=warehouse["auto_suspend"], key=f"sql_suspend_{i}")
             # if warehouse["auto_suspend"]:
@@ -394,6 +425,425 @@ def render_sql_warehouse_tab(total_sql_cost):
         st.markdown(f"<h2 style='text-align: center;'>${total_sql_cost:,.2f}/month</h2>", unsafe_allow_html=True)
         st.caption(f"{warehouse_count} warehouse(s) configured")
 
+def render_cost_breakdown_tab(calculated_dbx_data):
+    """Renders per-job cost breakdown charts, aggregated server-side so payloads stay bounded."""
+    st.header("Cost Breakdown")
+    jobs_df = combine_calculated_jobs(calculated_dbx_data)
+    if jobs_df.empty or jobs_df['Total Cost'].sum() <= 0:
+        st.info("No Databricks job costs configured yet.")
+        return
+
+    fingerprint = fingerprint_jobs(jobs_df)
+
+    with st.container(border=True):
+        c1, c2 = st.columns([3, 1])
+        c1.subheader("Top Jobs (Pareto)")
+        top_n = c2.number_input("Top N", min_value=5, max_value=100, value=DEFAULT_TOP_N, step=5, key="breakdown_top_n")
+        st.plotly_chart(build_pareto_figure(fingerprint, jobs_df, top_n), use_container_width=True)
+
+    with st.container(border=True):
+        st.subheader("Cost by Tier & Instance Family")
+        st.plotly_chart(build_treemap_figure(fingerprint, jobs_df), use_container_width=True)
+
+    c1, c2 = st.columns(2)
+    with c1:
+        with st.container(border=True):
+            st.subheader("Cost by Instance Family")
+            st.plotly_chart(build_family_figure(fingerprint, jobs_df), use_container_width=True)
+    with c2:
+        with st.container(border=True):
+            st.subheader("Per-Job Cost Distribution")
+            st.plotly_chart(build_histogram_figure(fingerprint, jobs_df), use_container_width=True)
+
+def render_compare_tab(calculated_dbx_data, s3_costs_per_zone):
+    """Renders the estimate comparison tab: save the current estimate and diff it against a baseline."""
+    st.header("Compare Estimates")
+    current_estimate = build_estimate(calculated_dbx_data, s3_costs_per_zone, st.session_state.sql_warehouses)
+
+    with st.container(border=True):
+        c1, c2 = st.columns([3, 1])
+        snapshot_name = c1.text_input("Save current estimate as", value=f"Estimate {len(st.session_state.saved_estimates) + 1}", key="compare_snapshot_name")
+        c2.write("")
+        if c2.button("💾 Save", key="compare_save_snapshot"):
+            st.session_state.saved_estimates[snapshot_name] = current_estimate
+            st.rerun()
+
+    with st.container(border=True):
+        source = st.radio("Compare current estimate against", ["Saved estimate", "Exported file"], key="compare_source", horizontal=True)
+        baseline = None
+        if source == "Saved estimate":
+            if st.session_state.saved_estimates:
+                baseline_name = st.selectbox("Baseline", list(st.session_state.saved_estimates.keys()), key="compare_baseline_name")
+                baseline = st.session_state.saved_estimates[baseline_name]
+            else:
+                st.info("No saved estimates yet. Save the current estimate above before making changes.")
+        else:
+            uploaded = st.file_uploader("Exported cost report (.xlsx, or .zip Parquet/Arrow bundle)", type=["xlsx", "zip"], key="compare_upload")
+            if uploaded is not None:
+                try:
+                    if uploaded.name.endswith(".zip"):
+                        baseline = load_estimate_from_bundle(uploaded)
+                    else:
+                        baseline = load_estimate_from_excel(uploaded)
+                except (KeyError, ValueError) as e:
+                    st.error(f"Could not read the exported report: {e}")
+
+    if baseline is None:
+        return
+
+    diff = diff_estimates(baseline, current_estimate)
+    summary = diff["summary"]
+    total_before = summary["Before"].sum()
+    total_after = summary["After"].sum()
+
+    with st.container(border=True):
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Baseline Total", f"${total_before:,.2f}")
+        c2.metric("Current Total", f"${total_after:,.2f}")
+        c3.metric("Change", f"${total_after - total_before:,.2f}", delta=f"{total_after - total_before:,.2f}", delta_color="inverse")
+        st.dataframe(summary, hide_index=True, use_container_width=True, column_config={
+            "Before": st.column_config.NumberColumn(format="$%.2f"),
+            "After": st.column_config.NumberColumn(format="$%.2f"),
+            "Δ": st.column_config.NumberColumn(format="$%.2f"),
+        })
+
+    jobs_diff = diff["jobs"]
+    with st.container(border=True):
+        st.subheader("Databricks Jobs")
+        counts = jobs_diff["Status"].value_counts()
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Added", int(counts.get("Added", 0)))
+        c2.metric("Removed", int(counts.get("Removed", 0)))
+        c3.metric("Changed", int(counts.get("Changed", 0)))
+        st.dataframe(jobs_diff[jobs_diff["Status"] != "Unchanged"], hide_index=True, use_container_width=True)
+
+    c1, c2 = st.columns(2)
+    with c1:
+        with st.container(border=True):
+            st.subheader("S3 Zones")
+            st.dataframe(diff["s3_zones"], hide_index=True, use_container_width=True)
+    with c2:
+        with st.container(border=True):
+            st.subheader("SQL Warehouses")
+            st.dataframe(diff["warehouses"], hide_index=True, use_container_width=True)
+
+def render_sensitivity_tab(base_annual_cost, sensitivity_df):
+    """Renders the tornado chart showing which cost drivers move the 12-month projection most."""
+    st.header("Sensitivity Analysis")
+    st.markdown("Impact of moving each cost driver down and up on the **12-month projected cost**.")
+
+    with st.container(border=True):
+        c1, c2, c3 = st.columns(3)
+        c1.metric("12-Month Projected Cost", f"${base_annual_cost:,.2f}")
+        c2.number_input("Perturbation %", min_value=1.0, max_value=100.0, step=1.0, format="%.0f", key="sensitivity_percent")
+        c3.number_input("S3 Growth Shift (pp)", min_value=0.1, max_value=20.0, step=0.1, format="%.1f", key="sensitivity_s3_growth_points")
+
+    if sensitivity_df.empty or sensitivity_df["Swing ($)"].sum() <= 0:
+        st.info("No costs configured yet.")
+        return
+
+    # Largest swing at the top of the tornado
+    chart_df = sensitivity_df[sensitivity_df["Swing ($)"] > 0].iloc[::-1]
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        y=chart_df["Driver"], x=chart_df["Low Impact ($)"], orientation="h", name="Low",
+        marker_color='#3CB371', hovertemplate="%{y}<br>$%{x:,.2f}<extra></extra>"
+    ))
+    fig.add_trace(go.Bar(
+        y=chart_df["Driver"], x=chart_df["High Impact ($)"], orientation="h", name="High",
+        marker_color='#FF8C00', hovertemplate="%{y}<br>$%{x:,.2f}<extra></extra>"
+    ))
+    fig.update_layout(
+        barmode="overlay",
+        xaxis=dict(title="Change in 12-Month Cost ($)", zeroline=True),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
+        margin=dict(t=30, b=0, l=0, r=0),
+        height=max(300, 28 * len(chart_df))
+    )
+    with st.container(border=True):
+        st.plotly_chart(fig, use_container_width=True)
+
+    st.dataframe(sensitivity_df, hide_index=True, use_container_width=True, column_config={
+        "Low Impact ($)": st.column_config.NumberColumn(format="$%.2f"),
+        "High Impact ($)": st.column_config.NumberColumn(format="$%.2f"),
+        "Swing ($)": st.column_config.NumberColumn(format="$%.2f"),
+    })
+
+def render_commitments_tab(calculated_dbx_data, sql_cost):
+    """Renders the DBU commit and EC2 savings plan evaluator with break-even curves."""
+    st.header("Commitments & Savings Plans")
+    st.markdown("Sweeps monthly commitment levels for each term against the projected usage (using the Databricks monthly growth rate).")
+
+    num_levels = st.number_input("Commit levels to evaluate", min_value=100, max_value=10000, value=DEFAULT_COMMIT_LEVELS, step=100, key="commit_levels")
+    results = evaluate_commitments(calculated_dbx_data, sql_cost, st.session_state.monthly_growth_percent, num_levels)
+
+    for key, title in (("dbu", "DBU Pre-Purchase Commit"), ("ec2", "EC2 Savings Plan (On-Demand Usage)")):
+        result = results[key]
+        with st.container(border=True):
+            st.subheader(title)
+            if result["monthly_cost"] <= 0:
+                st.info("No eligible usage configured yet.")
+                continue
+
+            optimum = result["optimum"]
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Monthly List Usage", f"${result['monthly_cost']:,.2f}")
+            c2.metric("Optimal Commit", f"${optimum['Monthly Commit ($)']:,.2f}/mo")
+            c3.metric("Optimal Term", f"{int(optimum['Term (months)'])} months")
+            c4.metric("Monthly Savings", f"${optimum['Monthly Savings ($)']:,.2f}", delta=f"{optimum['Savings %']:.1f}%")
+
+            curve = result["curve"]
+            fig = go.Figure()
+            for term, term_curve in curve.groupby("Term (months)"):
+                fig.add_trace(go.Scatter(
+                    x=term_curve["Monthly Commit ($)"], y=term_curve["Savings ($)"] / term,
+                    mode="lines", name=f"{term}-month term",
+                    hovertemplate="Commit $%{x:,.0f}/mo<br>Savings $%{y:,.2f}/mo<extra></extra>"
+                ))
+            fig.add_hline(y=0, line_dash="dash", line_color="gray")
+            fig.update_layout(
+                xaxis=dict(title="Monthly Commit ($)"),
+                yaxis=dict(title="Average Monthly Savings ($)"),
+                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
+                margin=dict(t=30, b=0, l=0, r=0),
+                height=350
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+            c1, c2 = st.columns(2)
+            c1.dataframe(result["usage"], hide_index=True, use_container_width=True, column_config={
+                "Monthly Cost ($)": st.column_config.NumberColumn(format="$%.2f"),
+            })
+            c2.dataframe(
+                pd.DataFrame({"Term (months)": list(result["break_even"].keys()), "Break-Even Commit ($/mo)": list(result["break_even"].values())}),
+                hide_index=True, use_container_width=True,
+                column_config={"Break-Even Commit ($/mo)": st.column_config.NumberColumn(format="$%.2f")}
+            )
+
+def render_chargeback_tab(calculated_dbx_data, s3_costs_per_zone):
+    """Renders chargeback reports grouped by any combination of tags."""
+    st.header("Chargeback")
+    st.markdown("Group costs by any combination of tags. Blank tags are reported as *(untagged)*.")
+
+    items = build_cost_items(
+        calculated_dbx_data,
+        st.session_state.s3_calc_method,
+        st.session_state.s3_direct,
+        st.session_state.s3_table_based,
+        st.session_state.s3_zone_tags,
+        s3_costs_per_zone,
+        st.session_state.sql_warehouses
+    )
+    # The index survives reruns until the items change, so re-slicing only re-reduces it
+    chargeback_index = get_chargeback_index(items, st.session_state)
+
+    c1, c2 = st.columns([3, 1])
+    with c1:
+        dimensions = st.multiselect("Group by", GROUP_DIMENSIONS, default=["Team"], key="chargeback_dimensions")
+    with c2:
+        st.write("")
+        # The workbook holds every line item, so it is only written once asked for, then cached
+        export_key = (chargeback_index.fingerprint, tuple(dimensions))
+        if st.session_state.get("chargeback_export_key") == export_key:
+            st.download_button(
+                label="📑 Export Chargeback",
+                data=generate_chargeback_excel_export_cached(chargeback_index.fingerprint, chargeback_index, tuple(dimensions)),
+                file_name="chargeback_report.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                key="export_chargeback_excel_button"
+            )
+        else:
+            st.button("📑 Prepare Export", key="prepare_chargeback_export", on_click=_prepare_export,
+                      args=("chargeback_export_key", export_key), help="Builds the chargeback workbook for the current grouping.")
+
+    grouped = chargeback_index.aggregate(dimensions)
+    with st.container(border=True):
+        if dimensions and not grouped.empty:
+            labels = grouped[dimensions].astype(str).agg(" · ".join, axis=1)
+            # Only the largest groups are charted; the table below has all of them
+            chart_rows = grouped.head(25)
+            fig = go.Figure()
+            for measure, color in (("DBU Cost", '#FF8C00'), ("EC2 Cost", '#1E90FF'), ("S3 Cost", '#3CB371'), ("SQL Cost", '#9370DB')):
+                fig.add_trace(go.Bar(x=labels.head(25), y=chart_rows[measure], name=measure, marker_color=color))
+            fig.update_layout(
+                barmode="stack",
+                yaxis=dict(title="Monthly Cost ($)"),
+                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
+                margin=dict(t=30, b=0, l=0, r=0),
+                height=350
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+        st.dataframe(grouped, hide_index=True, use_container_width=True, column_config={
+            measure: st.column_config.NumberColumn(format="$%.2f") for measure in ["DBU Cost", "EC2 Cost", "S3 Cost", "SQL Cost", "Total Cost"]
+        })
+
+def render_concurrency_tab(calculated_dbx_data):
+    """Renders the schedule-based concurrency simulation: peak and P95 concurrent nodes."""
+    st.header("Concurrency")
+    st.markdown("Simulates one month of job runs to size instance quotas and pools. Jobs with a cron **Schedule** run on it; the rest spread their Runs/Month evenly.")
+
+    today = pd.Timestamp.today()
+    c1, c2 = st.columns(2)
+    year = c1.number_input("Year", min_value=2000, max_value=2100, value=today.year, key="concurrency_year")
+    month = c2.selectbox("Month", list(range(1, 13)), index=today.month - 1, key="concurrency_month")
+
+    jobs_df = combine_calculated_jobs(calculated_dbx_data)
+    if jobs_df.empty:
+        st.info("No Databricks jobs configured yet.")
+        return
+
+    result = simulate_concurrency_cached(fingerprint_schedule_inputs(jobs_df), jobs_df, int(year), int(month))
+    for error in result["schedule_errors"]:
+        st.warning(f"{error}. Runs for these jobs were spread evenly instead.")
+
+    overall = result["summary"].iloc[-1]
+    with st.container(border=True):
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Peak Concurrent Nodes", f"{overall['Peak Nodes']:,.0f}")
+        c2.metric(f"P{PEAK_PERCENTILE} Concurrent Nodes", f"{overall[f'P{PEAK_PERCENTILE} Nodes']:,.0f}")
+        c3.metric("Mean Concurrent Nodes", f"{overall['Mean Nodes']:,.1f}")
+
+        hourly_peak = result["hourly_peak"]
+        fig = go.Figure()
+        for column in hourly_peak.columns:
+            fig.add_trace(go.Scatter(x=hourly_peak.index, y=hourly_peak[column], mode="lines", name=column, line_shape="hv"))
+        fig.update_layout(
+            yaxis=dict(title="Concurrent Nodes (hourly max)"),
+            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
+            margin=dict(t=30, b=0, l=0, r=0),
+            height=400
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+    st.dataframe(result["summary"], hide_index=True, use_container_width=True)
+
+    scheduled_runs = result["scheduled_runs"]
+    mismatched = scheduled_runs[(scheduled_runs["Schedule"] != "") & (scheduled_runs["Simulated Runs"] != scheduled_runs["Runs/Month"])]
+    if not mismatched.empty:
+        with st.expander(f"⚠️ {len(mismatched)} scheduled job(s) whose schedule disagrees with Runs/Month"):
+            st.dataframe(mismatched, hide_index=True, use_container_width=True)
+
+def render_consolidation_tab(calculated_dbx_data, s3_costs_per_zone):
+    """Renders the cluster consolidation planner: compatible jobs packed onto shared clusters."""
+    st.header("Cluster Consolidation")
+    st.markdown(
+        "Packs jobs that share tier, instance type, Photon and Spot onto shared clusters, using each job's "
+        "**Schedule** (or evenly spread Runs/Month) as its run windows. Shared clusters run one driver and "
+        "start once per busy period instead of once per run; workers autoscale to the jobs' own node counts."
+    )
+
+    today = pd.Timestamp.today()
+    c1, c2, c3, c4, c5 = st.columns(5)
+    year = c1.number_input("Year", min_value=2000, max_value=2100, value=today.year, key="consolidation_year")
+    month = c2.selectbox("Month", list(range(1, 13)), index=today.month - 1, key="consolidation_month")
+    max_workers = c3.number_input("Max Workers per Cluster", min_value=1, max_value=1000, value=DEFAULT_MAX_CLUSTER_WORKERS, key="consolidation_max_workers")
+    startup_minutes = c4.number_input("Start-up Minutes", min_value=0, max_value=60, value=DEFAULT_STARTUP_MINUTES, key="consolidation_startup_minutes",
+                                      help="Billed cluster start-up time. Per run for separate clusters, per busy period for shared ones.")
+    idle_minutes = c5.number_input("Idle Minutes", min_value=0, max_value=120, value=DEFAULT_IDLE_MINUTES, key="consolidation_idle_minutes",
+                                   help="How long a shared cluster stays up after its last run before auto-terminating.")
+
+    jobs_df = combine_calculated_jobs(calculated_dbx_data)
+    if jobs_df.empty:
+        st.info("No Databricks jobs configured yet.")
+        return
+
+    plan_key = (fingerprint_plan_inputs(jobs_df), int(year), int(month), int(max_workers), int(startup_minutes), int(idle_minutes))
+    plan = plan_consolidation_cached(plan_key[0], jobs_df, *plan_key[1:])
+    for error in plan["schedule_errors"]:
+        st.warning(f"{error}. Runs for these jobs were spread evenly instead.")
+
+    total = plan["summary"].iloc[-1]
+    baseline = total["Baseline DBU ($)"] + total["Baseline EC2 ($)"]
+    projected = total["Projected DBU ($)"] + total["Projected EC2 ($)"]
+    with st.container(border=True):
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Baseline (per-job clusters)", f"${baseline:,.2f}")
+        c2.metric("Projected (shared clusters)", f"${projected:,.2f}", delta=f"{projected - baseline:,.2f}", delta_color="inverse")
+        c3.metric("DBU Savings", f"${total['DBU Savings ($)']:,.2f}")
+        c4.metric("EC2 Savings", f"${total['EC2 Savings ($)']:,.2f}")
+        st.caption(f"{total['Shared Jobs']:,} of {total['Jobs']:,} jobs share one of {total['Clusters']:,} clusters.")
+
+    money = {column: st.column_config.NumberColumn(format="$%.2f") for column in plan["summary"].columns if "($)" in column}
+    st.dataframe(plan["summary"], hide_index=True, use_container_width=True, column_config={**money, "Savings %": st.column_config.NumberColumn(format="%.1f%%")})
+    with st.expander(f"Clusters ({len(plan['clusters'])})"):
+        st.dataframe(plan["clusters"], hide_index=True, use_container_width=True)
+    with st.expander("Job assignments"):
+        st.dataframe(plan["assignments"], hide_index=True, use_container_width=True)
+
+    c1, c2, c3 = st.columns([2, 1, 1])
+    scenario_name = c1.text_input("Scenario name", value=f"Consolidated {year}-{month:02d}", key="consolidation_scenario_name", label_visibility="collapsed")
+    if c2.button("💾 Save as Scenario", key="consolidation_save_scenario", help="Adds the plan to the saved estimates in the Compare tab."):
+        st.session_state.saved_estimates[scenario_name] = build_estimate(plan["calculated_dbx_data"], s3_costs_per_zone, st.session_state.sql_warehouses)
+        st.success(f"Saved '{scenario_name}'. Compare it against the current estimate in the Compare tab.")
+    # One Assignments row per job: the workbook is only written once asked for, then cached with the plan
+    if st.session_state.get("consolidation_export_key") == plan_key:
+        c3.download_button(
+            label="📑 Export Plan",
+            data=generate_consolidation_excel_export_cached(plan_key[0], plan, *plan_key[1:]),
+            file_name="cluster_consolidation_plan.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            key="export_consolidation_excel_button"
+        )
+    else:
+        c3.button("📑 Prepare Export", key="prepare_consolidation_export", on_click=_prepare_export,
+                  args=("consolidation_export_key", plan_key), help="Builds the plan workbook for the current parameters.")
+
+def _prepare_export(state_key, export_key):
+    st.session_state[state_key] = export_key
+
+def _undo_estimate():
+    st.session_state.estimate_history.undo(st.session_state)
+
+
+def _redo_estimate():
+    st.session_state.estimate_history.redo(st.session_state)
+
+
+def render_history_controls():
+    """Renders the Undo / Redo buttons for the estimate inputs."""
+    history = st.session_state.estimate_history
+    undo_col, redo_col = st.columns(2)
+    undo_col.button("↶ Undo", key="undo_estimate_button", on_click=_undo_estimate, disabled=not history.undo_stack,
+                    help=f"{len(history.undo_stack)} step(s) to undo (keeps the last {history.depth})", use_container_width=True)
+    redo_col.button("↷ Redo", key="redo_estimate_button", on_click=_redo_estimate, disabled=not history.redo_stack,
+                    help=f"{len(history.redo_stack)} step(s) to redo", use_container_width=True)
+
+def _dismiss_price_notice():
+    st.session_state.pop("price_notice", None)
+
+
+def render_price_notice(price_watcher):
+    """Tells the analyst which parts of their estimate were repriced by a price reload."""
+    # The watcher thread updates errors while scripts run, so iterate over a copy
+    for file_name, error in price_watcher.errors.copy().items():
+        st.warning(f"Price file '{file_name}' could not be loaded, the previous prices are still in use: {error}")
+
+    notice = st.session_state.get("price_notice")
+    if not notice:
+        return
+    keys = notice["keys"]
+    changed_instances = {key[1] for key in keys if key[0] == "instance"}
+    changed_tiers = {key[1] for key in keys if key[0] == "dbu"}
+    jobs = sum(
+        len(jobs_df) if tier in changed_tiers else int(jobs_df["Instance Type"].isin(changed_instances).sum())
+        for tier, jobs_df in st.session_state.dbx_jobs.items()
+    )
+    if st.session_state.s3_calc_method == "Direct Storage":
+        zones = sum(("s3", config["class"]) in keys for config in st.session_state.s3_direct.values())
+    else:
+        zones = len(st.session_state.s3_table_based) if ("s3", "Standard") in keys else 0
+    warehouses = sum(("sql", warehouse["size"].split(" - ")[0]) in keys for warehouse in st.session_state.sql_warehouses)
+
+    with st.container(border=True):
+        c1, c2 = st.columns([5, 1])
+        c1.info(
+            f"Prices were updated to **{notice['pricing_version']}** ({len(keys)} price(s) changed). "
+            f"This estimate was repriced for {jobs} job(s), {zones} S3 zone(s) and {warehouses} SQL warehouse(s); "
+            f"{notice['affected_sessions']} of {notice['live_sessions']} live estimate(s) were affected."
+        )
+        c2.button("Dismiss", key="dismiss_price_notice", on_click=_dismiss_price_notice)
+
 def render_configuration_guide():
     """Renders the configuration guide expander at the bottom of a tab."""
     with st.expander("ℹ️ Configuration Guide", expanded=True):
@@ -413,7 +863,7 @@ def render_configuration_guide():
             **Instance Families** Choose instance types based on workload: General Purpose (`m5`), Compute Optimized (`c5`), Memory Optimized (`r5`/`r5d`).
             """)
 
-def render_export_button(calculated_dbx_data, s3_calc_method, s3_direct_config, s3_table_based_config, sql_warehouses_config):
+def render_export_button(calculated_dbx_data, s3_calc_method, s3_direct_config, s3_table_based_config, sql_warehouses_config, sensitivity_df=None):
     """
     Renders the Excel export button. This function is called from main.py.
     It orchestrates the data collection from session state and passes it
@@ -425,7 +875,8 @@ def render_export_button(calculated_dbx_data, s3_calc_method, s3_direct_config,
         s3_calc_method,
         s3_direct_config,
         s3_table_based_config,
-        sql_warehouses_config
+        sql_warehouses_config,
+        sensitivity_df
     )
 
     # Export Button (visible)
@@ -435,4 +886,27 @@ def render_export_button(calculated_dbx_data, s3_calc_method, s3_direct_config,
         file_name="cloud_cost_report.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         key="export_consolidated_excel_button"
-    )
\ No newline at end of file
+    )
+
+def render_arrow_export_button(calculated_dbx_data, s3_calc_method, s3_direct_config, s3_table_based_config, sql_warehouses_config, s3_costs_per_zone):
+    """
+    Renders the Parquet export button: one table per cost category, bundled in an
+    uncompressed zip, for BI and finance pipelines that read columnar files directly.
+    """
+    tables = build_estimate_tables(
+        calculated_dbx_data,
+        s3_calc_method,
+        s3_direct_config,
+        s3_table_based_config,
+        sql_warehouses_config,
+        s3_costs_per_zone,
+        calculate_sql_warehouse_cost_per_warehouse(sql_warehouses_config)
+    )
+
+    st.download_button(
+        label="🗂️ Export Parquet",
+        data=generate_estimate_bundle(tables, fmt="parquet"),
+        file_name="cloud_cost_report_parquet.zip",
+        mime="application/zip",
+        key="export_parquet_bundle_button"
+    )